@@ -38,7 +38,8 @@ yandex package for mobile energy consumption measurements
             'volta = volta.api.cli:main',
             'volta-http = volta.api.http:main',
             'volta-uploader = volta.core.postloader:main',
-            'volta-api = volta.api.manager:main'
+            'volta-api = volta.api.manager:main',
+            'volta-benchmark = volta.benchmark.suite:main'
         ],
     },
     license='MPLv2',
@@ -0,0 +1,126 @@
+""" TimeChopper micro-benchmarks
+
+Compare legacy sample buffering (np.append + slicing per chunk) w/ preallocated ring buffer
+and legacy per-slice pd.date_range timestamps w/ integer sample counter timestamps
+"""
+import logging
+import time
+import numpy as np
+import pandas as pd
+
+from volta.common.util import RingBuffer, sample_timestamps
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATES = [10000, 100000, 1000000]
+
+
+def synthetic_chunks(sample_rate, duration, chunk_ratio=0.1):
+    """ Generates `duration` seconds of float32 samples, split into chunks of sample_rate * chunk_ratio """
+    chunk_size = max(int(sample_rate * chunk_ratio), 1)
+    chunk = np.random.uniform(0, 1000, chunk_size).astype(np.float32)
+    for _ in range(int(duration / chunk_ratio)):
+        yield chunk
+
+
+def legacy_buffering(chunks, slice_size, stats):
+    """ Baseline buffering, reallocates the whole backlog for every incoming chunk, slices are views of it """
+    buffer = np.array([])
+    for chunk in chunks:
+        buffer = np.append(buffer, chunk)
+        stats['allocations'] += 1
+        while len(buffer) > slice_size:
+            ready_sample = buffer[:slice_size]
+            buffer = buffer[slice_size:]
+            yield ready_sample
+
+
+def ring_buffering(chunks, slice_size, stats):
+    """ TimeChopper buffering: preallocated float32 ring buffer, a new array for every slice as slices
+    are passed to listeners and kept by them, plus storage reallocations
+    """
+    buffer = RingBuffer(slice_size * 2)
+    slices = 0
+    for chunk in chunks:
+        buffer.put(chunk)
+        while len(buffer) > slice_size:
+            slices += 1
+            stats['allocations'] = buffer.reallocations + slices
+            yield buffer.get(slice_size)
+        stats['allocations'] = buffer.reallocations + slices
+
+
+def run(buffering, sample_rate, duration=10, chop_ratio=1.0):
+    """ Drain `duration` seconds of synthetic data through buffering stage
+
+    Returns:
+        dict: samples/sec, buffer allocations/sec and peak traced memory
+    """
+    slice_size = int(sample_rate * chop_ratio)
+    stats = {'allocations': 0}
+    slices = buffering(synthetic_chunks(sample_rate, duration), slice_size, stats)
+    if tracemalloc:
+        tracemalloc.start()
+    start = time.time()
+    samples = 0
+    for ready_sample in slices:
+        samples += len(ready_sample)
+    elapsed = max(time.time() - start, 1e-9)
+    peak = None
+    if tracemalloc:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {
+        'sample_rate': sample_rate,
+        'samples_per_sec': samples / elapsed,
+        'allocations_per_sec': stats['allocations'] / elapsed,
+        'allocations_per_data_sec': float(stats['allocations']) / duration,
+        'peak_memory': peak,
+    }
+
+
+def legacy_timestamps(sample_num, amount, sample_rate):
+    """ Baseline timestamps, string frequency + pd.date_range for every slice """
+    idx = "{value}{units}".format(value=int(10 ** 6 / sample_rate), units="us")
+    current_ts = int((sample_num * (1. / sample_rate)) * 10 ** 9)
+    return pd.date_range(current_ts, periods=amount, freq=idx).astype(np.int64) // 1000
+
+
+def run_timestamps(timestamps, sample_rate, duration=10, chop_ratio=1.0):
+    """ Generate timestamps for `duration` seconds of slices
+
+    Returns:
+        dict: slices/sec and drift of the last timestamp from exact sample time, us
+    """
+    slice_size = int(sample_rate * chop_ratio)
+    slices = int(duration / chop_ratio)
+    start = time.time()
+    for slice_num in range(slices):
+        ts = timestamps(slice_num * slice_size, slice_size, sample_rate)
+    elapsed = max(time.time() - start, 1e-9)
+    last_sample = slices * slice_size - 1
+    return {
+        'sample_rate': sample_rate,
+        'slices_per_sec': slices / elapsed,
+        'drift_us': int(ts[-1]) - last_sample * 10 ** 6 // sample_rate,
+    }
+
+
+def main():
+    logging.basicConfig(level="INFO", format='%(asctime)s [%(levelname)s] [Volta benchmark] %(message)s')
+    for sample_rate in SAMPLE_RATES:
+        for name, buffering in [('legacy', legacy_buffering), ('ring', ring_buffering)]:
+            logger.info('%s buffering: %s', name, run(buffering, sample_rate))
+    for sample_rate in SAMPLE_RATES + [30000, 44100]:
+        for name, timestamps in [('legacy', legacy_timestamps), ('sample counter', sample_timestamps)]:
+            logger.info('%s timestamps: %s', name, run_timestamps(timestamps, sample_rate))
+
+
+if __name__ == "__main__":
+    main()
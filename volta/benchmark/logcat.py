@@ -0,0 +1,384 @@
+""" Phone log parsing benchmarks
+
+Replay recorded (or synthetic) logcat dump through LogParser in read batches
+"""
+import argparse
+import datetime
+import logging
+import queue
+import re
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+from volta.common.util import LogParser, EpochLogParser, ProcessLogParser, LogTimestampParser, Executioner, \
+    format_ts_from_android, format_ts_from_iphone
+from volta.providers.phones.android import event_regexp
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+logger = logging.getLogger(__name__)
+
+TAGS = ['ActivityManager', 'WindowManager', 'chatty', 'NetworkController', 'BatteryService', 'InputReader']
+
+
+def logcat_dump(lines=100000, volta_ratio=0.01, seed=0, epoch=False):
+    """ Synthetic `adb logcat` threadtime dump w/ `volta_ratio` of volta custom events
+
+    Args:
+        epoch (bool): `adb logcat -v epoch` dump of the same log, 12 Feb of current year
+
+    Returns:
+        list: log lines, bytes
+    """
+    rng = np.random.RandomState(seed)
+    dump = []
+    start = 12 * 3600 * 1000
+    epoch_start = (datetime.datetime(datetime.datetime.now().year, 2, 12) - datetime.datetime(1970, 1, 1)).days
+    for num, ms in enumerate(np.sort(rng.randint(0, 600000, lines)) + start):
+        if epoch:
+            ts = '{}.{:03d}'.format(epoch_start * 86400 + ms // 1000, ms % 1000)
+        else:
+            ts = '02-12 {:02d}:{:02d}:{:02d}.{:03d}'.format(
+                ms // 3600000, ms // 60000 % 60, ms // 1000 % 60, ms % 1000
+            )
+        if rng.uniform() < volta_ratio:
+            tag, message = 'VoltaLightning', '[volta] {} sync Lightning {}'.format(
+                ms * 10 ** 6, 'rise' if num % 2 else 'fall'
+            )
+        else:
+            tag, message = TAGS[num % len(TAGS)], 'some message #{} w/ payload {}'.format(num, rng.randint(10 ** 6))
+        dump.append('{} {:5d} {:5d} I {}: {}\n'.format(ts, 1000 + num % 7, 2000 + num % 13, tag, message).encode())
+    return dump
+
+
+def read_dump(fname):
+    """ Recorded `adb logcat` dump, list of bytes lines """
+    with open(fname, 'rb') as dump:
+        return dump.readlines()
+
+
+class ReplayQueue(object):
+    """ Queue-like source serving log lines in read batches of `batch` lines, closes parser in the end """
+
+    def __init__(self, lines, batch):
+        self.lines = lines
+        self.batch = batch
+        self.position = 0
+        self.served = 0
+        self.parser = None
+
+    def qsize(self):
+        return min(self.batch - self.served, len(self.lines) - self.position)
+
+    def get(self, block=True, timeout=None):
+        """ The first line of the next read batch """
+        self.served = 0
+        return self.get_nowait()
+
+    def get_nowait(self):
+        if self.served >= self.batch or self.position >= len(self.lines):
+            raise queue.Empty()
+        line = self.lines[self.position]
+        self.position += 1
+        self.served += 1
+        if self.position == len(self.lines):
+            self.parser.closed = True
+        return line
+
+
+def epoch_parser(source, log_fmt_regexp, phone_type):
+    """ EpochLogParser w/ LogParser signature, regexp is not used """
+    return EpochLogParser(source, phone_type)
+
+
+class VoltaLogParser(LogParser):
+    """ LogParser w/ '[volta]' prefilter """
+
+    def __init__(self, source, log_fmt_regexp, phone_type, cache_size=10):
+        super(VoltaLogParser, self).__init__(source, log_fmt_regexp, phone_type, cache_size, prefilter=['[volta]'])
+
+
+def process_parser(source, log_fmt_regexp, phone_type):
+    """ LogParser in worker process """
+    return ProcessLogParser(source, LogParser, log_fmt_regexp, phone_type)
+
+
+def cpu_time():
+    """ User and system CPU time of this process (worker processes excluded), seconds """
+    if not resource:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+class PerLineLogParser(LogParser):
+    """ Baseline LogParser, strptime timestamps and DataFrame for every log line """
+    formatters = {
+        'android': format_ts_from_android, 'abro': format_ts_from_android,
+        'iphone': format_ts_from_iphone
+    }
+
+    def __iter__(self):
+        while not self.closed:
+            log_entries = self._read_chunk()
+            if log_entries:
+                for log_entry in log_entries:
+                    ts = legacy_timestamp(self.formatters[self.phone_type], log_entry)
+                    log_entry = self._parse_entry(log_entry, ts)
+                    if log_entry is None:
+                        continue
+                    df = pd.DataFrame(data={log_entry['ts']: log_entry}).T
+                    df.loc[:, ('value')] = df['value'].astype(str)
+                    yield df
+
+
+def log_entries(lines, regexp=event_regexp):
+    """ Log format regexp groups of log lines """
+    log_fmt_regexp = re.compile(regexp, re.VERBOSE | re.IGNORECASE)
+    matches = [log_fmt_regexp.match(line.decode('utf-8', 'replace')) for line in lines]
+    return [match.groupdict() for match in matches if match]
+
+
+def iphone_entries(amount=10000, seed=0):
+    """ Synthetic iphone syslog timestamps groups """
+    rng = np.random.RandomState(seed)
+    months = ['Jan', 'feb', 'MAR', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+    return [
+        {
+            'month': months[rng.randint(12)],
+            'date': str(rng.randint(1, 29)),
+            'time': '{:02d}:{:02d}:{:d}'.format(rng.randint(24), rng.randint(60), rng.randint(60)),
+        } for _ in range(amount)
+    ]
+
+
+MALFORMED_ANDROID_ENTRIES = [
+    {'date': '02-30', 'time': '12:00:00.000'},
+    {'date': '13-01', 'time': '12:00:00.000'},
+    {'date': '02-12', 'time': '24:00:00.000'},
+    {'date': '02-12', 'time': '12:00:60.000'},
+    {'date': '2-12', 'time': '1:02:03.4'},
+    {'date': '02-12', 'time': '12:00:00.123456'},
+    {'date': '02/12', 'time': '12:00:00.000'},
+    {'date': '02-12', 'time': '12:00:00'},
+    {'date': '--------', 'time': 'beginning of main'},
+    {'date': '02-12', 'time': '12:0a:00.000'},
+    {'time': '12:00:00.000'},
+]
+
+
+def legacy_timestamp(formatter, log_entry):
+    """ Baseline log entry uts, strptime formatter and float seconds, None if malformed """
+    try:
+        ts = formatter(log_entry)
+    except (ValueError, IndexError):
+        return
+    return int((ts - datetime.datetime(1970, 1, 1)).total_seconds() * 10 ** 6)
+
+
+def exact_timestamp(formatter, log_entry):
+    """ strptime formatter uts in integer us, None if malformed """
+    try:
+        delta = formatter(log_entry) - datetime.datetime(1970, 1, 1)
+    except (ValueError, IndexError):
+        return
+    return (delta.days * 86400 + delta.seconds) * 10 ** 6 + delta.microseconds
+
+
+def check_timestamps(lines):
+    """ LogTimestampParser vs format_ts_from_android/format_ts_from_iphone
+
+    Returns:
+        dict: compared entries and mismatches amount for batch and per-entry parsing, by phone type
+    """
+    result = {}
+    cases = [
+        ('android', format_ts_from_android, log_entries(lines) + MALFORMED_ANDROID_ENTRIES),
+        ('iphone', format_ts_from_iphone, iphone_entries() + [{'month': 'Foo', 'date': '1', 'time': '1:2:3'}]),
+    ]
+    for phone_type, formatter, entries in cases:
+        parser = LogTimestampParser(phone_type)
+        expected = [exact_timestamp(formatter, entry) for entry in entries]
+        per_entry = []
+        for entry in entries:
+            try:
+                per_entry.append(parser.parse(entry))
+            except ValueError:
+                per_entry.append(None)
+        result[phone_type] = {
+            'entries': len(entries),
+            'batch_mismatches': sum(a != b for a, b in zip(expected, parser.parse_batch(entries))),
+            'per_entry_mismatches': sum(a != b for a, b in zip(expected, per_entry)),
+        }
+    return result
+
+
+def run_timestamps(lines):
+    """ Parse timestamps of log lines w/ strptime formatter, cached parser per entry and in one batch
+
+    Returns:
+        dict: entries/sec for each way
+    """
+    entries = log_entries(lines)
+    parser = LogTimestampParser('android')
+    result = {}
+    for name, parse in [
+        ('strptime', lambda: [legacy_timestamp(format_ts_from_android, entry) for entry in entries]),
+        ('per_entry', lambda: [parser.parse(entry) for entry in entries]),
+        ('batch', lambda: parser.parse_batch(entries)),
+    ]:
+        start = time.time()
+        parse()
+        result['%s_entries_per_sec' % name] = len(entries) / max(time.time() - start, 1e-9)
+    return result
+
+
+def parse_log(parser_class, lines, batch=1000, phone_type='android', regexp=event_regexp):
+    """ Parse log lines in read batches of `batch` lines
+
+    Returns:
+        tuple: parsed DataFrames, elapsed time, CPU time of this process
+    """
+    source = ReplayQueue(lines, batch)
+    parser = parser_class(source, re.compile(regexp, re.VERBOSE | re.IGNORECASE), phone_type)
+    source.parser = parser
+    start, cpu_start = time.time(), cpu_time()
+    frames = list(parser)
+    cpu = cpu_time() - cpu_start if resource else None
+    return frames, max(time.time() - start, 1e-9), cpu
+
+
+def run_log_parser(parser_class, lines, batch=1000, phone_type='android', regexp=event_regexp):
+    """ Parse log lines in read batches of `batch` lines
+
+    Returns:
+        dict: lines/sec, CPU time of this process, parsed entries and DataFrames amount
+    """
+    frames, elapsed, cpu = parse_log(parser_class, lines, batch, phone_type, regexp)
+    return {
+        'parser': getattr(parser_class, '__name__', str(parser_class)),
+        'lines': len(lines),
+        'lines_per_sec': len(lines) / elapsed,
+        'cpu_time': cpu,
+        'entries': sum(len(df) for df in frames),
+        'frames': len(frames),
+    }
+
+
+def check_process_parser(lines, batch=1000):
+    """ ProcessLogParser vs LogParser in this process
+
+    Returns:
+        dict: parsed entries amount by each parser and whether DataFrames are equal
+    """
+    expected = parse_log(LogParser, lines, batch)[0]
+    parsed = parse_log(process_parser, lines, batch)[0]
+    return {
+        'entries': sum(len(df) for df in expected),
+        'process_entries': sum(len(df) for df in parsed),
+        'equal': len(expected) == len(parsed) and all(a.equals(b) for a, b in zip(expected, parsed)),
+    }
+
+
+def check_epoch(threadtime_lines, epoch_lines, batch=1000):
+    """ EpochLogParser on `adb logcat -v epoch` capture vs LogParser on threadtime capture of the same log
+
+    Returns:
+        dict: compared entries and mismatches amount of sys_uts, value and custom columns
+    """
+    expected = pd.concat(parse_log(LogParser, threadtime_lines, batch)[0])
+    parsed = pd.concat(parse_log(epoch_parser, epoch_lines, batch)[0])
+    result = {'entries': len(expected), 'epoch_entries': len(parsed)}
+    if len(expected) != len(parsed):
+        return result
+    for column in ['sys_uts', 'value', 'custom_metric_type', 'message', 'log_uts']:
+        expected_column, parsed_column = expected[column].reset_index(drop=True), parsed[column].reset_index(drop=True)
+        both_null = expected_column.isnull() & parsed_column.isnull()
+        result['%s_mismatches' % column] = int(((expected_column != parsed_column) & ~both_null).sum())
+    return result
+
+
+def emit_probes(amount=20, interval=0.1):
+    """ Print threadtime log lines w/ volta custom events carrying their print time, one per `interval` seconds """
+    for num in range(amount):
+        time.sleep(interval)
+        now = time.time()
+        print('{} {:5d} {:5d} I VoltaProbe: [volta] {} latency probe {:.6f}'.format(
+            datetime.datetime.now().strftime('%m-%d %H:%M:%S.%f')[:-3], 1000, 2000, num, now
+        ))
+        sys.stdout.flush()
+
+
+def run_latency(parser_class=LogParser, amount=20, interval=0.1):
+    """ End-to-end delay of log events: print in subprocess -> Executioner -> parser -> DataFrame
+
+    Returns:
+        dict: delay percentiles, ms
+    """
+    worker = Executioner(
+        '{python} -c "from volta.benchmark.logcat import emit_probes; emit_probes({amount}, {interval})"'.format(
+            python=sys.executable, amount=amount, interval=interval
+        )
+    )
+    out_q, _ = worker.execute()
+    parser = parser_class(out_q, re.compile(event_regexp, re.VERBOSE | re.IGNORECASE), 'android')
+    delays = []
+    try:
+        for df in parser:
+            arrival = time.time()
+            delays += [arrival - float(message) for message in df['message'] if message]
+            if len(delays) >= amount:
+                break
+    finally:
+        parser.closed = True
+        if isinstance(parser, ProcessLogParser):
+            parser.close()
+        worker.close()
+    values = np.percentile(np.array(delays) * 1000, [50, 90, 100])
+    return {
+        'parser': getattr(parser_class, '__name__', str(parser_class)),
+        'events': len(delays),
+        'p50_ms': float(values[0]),
+        'p90_ms': float(values[1]),
+        'max_ms': float(values[2]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='volta phone log parsing benchmark')
+    parser.add_argument('-f', '--dump', dest='dump', default=None, help='recorded `adb logcat` dump, synthetic if omitted')
+    parser.add_argument(
+        '-e', '--epoch-dump', dest='epoch_dump', default=None,
+        help='recorded `adb logcat -v epoch` dump of the same log as --dump, synthetic if omitted'
+    )
+    parser.add_argument('-b', '--batch', dest='batch', type=int, default=1000, help='log lines per read batch')
+    args = parser.parse_args()
+
+    logging.basicConfig(level="INFO", format='%(asctime)s [%(levelname)s] [Volta benchmark] %(message)s')
+    lines = read_dump(args.dump) if args.dump else logcat_dump()
+    for parser_class in [PerLineLogParser, LogParser, VoltaLogParser]:
+        logger.info('%s', run_log_parser(parser_class, lines, args.batch))
+    result = run_log_parser(process_parser, lines, args.batch)
+    result['parser'] = ProcessLogParser.__name__
+    logger.info('%s', result)
+    logger.info('worker process parsing equivalent to LogParser: %s', check_process_parser(lines, args.batch))
+    if args.epoch_dump or not args.dump:
+        epoch_lines = read_dump(args.epoch_dump) if args.epoch_dump else logcat_dump(epoch=True)
+        result = run_log_parser(epoch_parser, epoch_lines, args.batch)
+        result['parser'] = EpochLogParser.__name__
+        logger.info('%s', result)
+        logger.info('epoch log equivalent to threadtime log: %s', check_epoch(lines, epoch_lines, args.batch))
+    logger.info('timestamps equivalent to strptime formatters: %s', check_timestamps(lines))
+    logger.info('timestamps: %s', run_timestamps(lines))
+    for parser_class in [LogParser, process_parser]:
+        logger.info('event delay: %s', run_latency(parser_class))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+""" VoltaBox readers benchmarks
+
+Drain synthetic captures from file-backed fake serial devices through box readers
+"""
+import logging
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+
+from volta.providers.boxes.box_binary import BoxBinaryReader, swap_samples
+from volta.providers.boxes.box500hz import BoxPlainTextReader
+from volta.common.util import RawCaptureWriter
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATES = [10000, 1000000]
+
+
+class ChunkedSource(object):
+    """ File wrapper returning at most `read_size` bytes per read, like serial port returning what has arrived """
+
+    def __init__(self, source, read_size):
+        self.source = source
+        self.read_size = read_size
+
+    def read(self, size=-1):
+        return self.source.read(self.read_size if size < 0 else min(size, self.read_size))
+
+    def readinto(self, buffer_):
+        return self.source.readinto(memoryview(buffer_)[:self.read_size])
+
+    def readline(self):
+        return self.source.readline()
+
+    def close(self):
+        self.source.close()
+
+
+class FakeSerial(object):
+    """ File-backed fake serial device w/ synthetic uint16 samples, or newline-separated text samples
+
+    Attributes:
+        read_size (int): max bytes returned per read, whole file if None
+    """
+
+    def __init__(self, sample_rate, duration, precision=10, text=False, read_size=None):
+        self.read_size = read_size
+        self.samples = int(sample_rate * duration)
+        self.dirname = tempfile.mkdtemp(prefix='volta_benchmark_')
+        self.path = os.path.join(self.dirname, 'capture.txt' if text else 'capture.bin')
+        self.data = np.random.randint(0, 2 ** precision, self.samples).astype(np.uint16)
+        if text:
+            with open(self.path, 'w') as capture:
+                capture.write('\n'.join(str(value) for value in self.data.tolist()) + '\n')
+        else:
+            self.data.tofile(self.path)
+
+    def open(self):
+        source = open(self.path, 'rb', 0)
+        if self.read_size:
+            return ChunkedSource(source, self.read_size)
+        return source
+
+    def close(self):
+        shutil.rmtree(self.dirname, ignore_errors=True)
+
+
+def run_binary_reader(sample_rate, duration=10, raw_capture=False, **reader_kwargs):
+    """ Read `duration` seconds of capture w/ BoxBinaryReader, optionally recording raw capture
+
+    Returns:
+        dict: samples/sec, reads/sec and peak traced memory
+    """
+    device = FakeSerial(sample_rate, duration)
+    source = device.open()
+    if raw_capture:
+        reader_kwargs['recorder'] = RawCaptureWriter(
+            os.path.join(device.dirname, 'raw_capture.bin'), np.uint16, {'sample_rate': sample_rate}
+        )
+    try:
+        reader = BoxBinaryReader(source, sample_rate, **reader_kwargs)
+        if tracemalloc:
+            tracemalloc.start()
+        start = time.time()
+        samples = reads = 0
+        while samples < device.samples:
+            samples += len(reader._read_chunk())
+            reads += 1
+        elapsed = max(time.time() - start, 1e-9)
+        peak = None
+        if tracemalloc:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+    finally:
+        if raw_capture:
+            reader_kwargs['recorder'].close()
+        source.close()
+        device.close()
+    return {
+        'sample_rate': sample_rate,
+        'samples_per_sec': samples / elapsed,
+        'reads_per_sec': reads / elapsed,
+        'peak_memory': peak,
+    }
+
+
+def run_plain_text_reader(sample_rate, duration=10, cache_size=64 * 1024):
+    """ Read `duration` seconds of text capture w/ BoxPlainTextReader, check parsed values
+
+    Returns:
+        dict: samples/sec and reads/sec
+    """
+    device = FakeSerial(sample_rate, duration, text=True)
+    source = device.open()
+    try:
+        reader = BoxPlainTextReader(source, cache_size)
+        start = time.time()
+        chunks = []
+        samples = reads = 0
+        while samples < device.samples:
+            chunk = reader._read_chunk()
+            reads += 1
+            if chunk is not None:
+                chunks.append(chunk)
+                samples += len(chunk)
+        elapsed = max(time.time() - start, 1e-9)
+        if not np.array_equal(np.concatenate(chunks), device.data[:samples]):
+            raise AssertionError('BoxPlainTextReader parsed values differ from capture')
+    finally:
+        source.close()
+        device.close()
+    return {
+        'sample_rate': sample_rate,
+        'samples_per_sec': samples / elapsed,
+        'reads_per_sec': reads / elapsed,
+    }
+
+
+def legacy_sample_swap(data, swap=False):
+    """ Baseline byte-swap detection, python loop over every 16-bit word """
+    lst = bytearray(data)
+    for i in range(len(lst) // 2):
+        lo = lst[i * 2]
+        hi = lst[i * 2 + 1]
+        word = (hi << 8) + lo
+        if word > 0x0FFF or (swap and (word & 0x00F0) == 0):
+            swap = True
+            lst[i * 2], lst[i * 2 + 1] = hi, lo
+        else:
+            swap = False
+    return bytes(lst), swap
+
+
+def random_swapped_words(samples, precision=10):
+    """ Samples w/ random runs of byte-swapped words and random trash words """
+    words = np.random.randint(0, 2 ** precision, samples).astype('<u2')
+    swapped = np.random.rand(samples) < 0.3
+    words[swapped] = words[swapped].byteswap()
+    trash = np.random.rand(samples) < 0.05
+    words[trash] = np.random.randint(0, 2 ** 16, trash.sum())
+    return words
+
+
+def check_sample_swap(samples=100000, chunks=10):
+    """ Compare vectorized swap_samples w/ baseline on random data, state carried over chunks """
+    words = random_swapped_words(samples)
+    swap = legacy_swap = False
+    for part in np.array_split(words, chunks):
+        expected, legacy_swap = legacy_sample_swap(part.tobytes(), legacy_swap)
+        part = part.copy()
+        swap = swap_samples(part, swap)
+        if part.tobytes() != expected or swap != legacy_swap:
+            raise AssertionError('swap_samples differs from baseline byte-swap detection')
+    return True
+
+
+def run_sample_swap(sample_rate, duration=1):
+    """ Throughput of baseline and vectorized byte-swap detection
+
+    Returns:
+        dict: samples/sec for baseline and vectorized implementations
+    """
+    words = random_swapped_words(int(sample_rate * duration))
+    data = words.tobytes()
+    start = time.time()
+    legacy_sample_swap(data)
+    legacy_elapsed = max(time.time() - start, 1e-9)
+    start = time.time()
+    swap_samples(words)
+    elapsed = max(time.time() - start, 1e-9)
+    return {
+        'sample_rate': sample_rate,
+        'legacy_samples_per_sec': len(words) / legacy_elapsed,
+        'samples_per_sec': len(words) / elapsed,
+    }
+
+
+def main():
+    logging.basicConfig(level="INFO", format='%(asctime)s [%(levelname)s] [Volta benchmark] %(message)s')
+    for sample_rate in SAMPLE_RATES:
+        for name, zero_copy in [('legacy', False), ('zero copy', True)]:
+            logger.info(
+                '%s BoxBinaryReader: %s', name, run_binary_reader(sample_rate, zero_copy=zero_copy)
+            )
+        logger.info(
+            'zero copy BoxBinaryReader w/ raw capture: %s',
+            run_binary_reader(sample_rate, raw_capture=True, zero_copy=True)
+        )
+    for sample_rate in [500] + SAMPLE_RATES:
+        logger.info('BoxPlainTextReader: %s', run_plain_text_reader(sample_rate))
+    logger.info('swap_samples equivalent to baseline: %s', check_sample_swap())
+    for sample_rate in SAMPLE_RATES:
+        logger.info('sample swap: %s', run_sample_swap(sample_rate))
+
+
+if __name__ == "__main__":
+    main()
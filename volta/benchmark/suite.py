@@ -0,0 +1,229 @@
+""" Pipeline throughput benchmark suite
+
+Drives box readers, TimeChopper and null metric sink w/ synthetic data, stage by stage,
+and writes machine-readable results, so throughput can be tracked between releases
+"""
+import argparse
+import json
+import logging
+import platform
+import time
+import numpy as np
+import pandas as pd
+import pkg_resources
+
+from volta.common.util import TimeChopper, CurrentRouter
+from volta.providers.boxes.box_binary import BoxBinaryReader
+from volta.providers.boxes.box500hz import BoxPlainTextReader
+from volta.providers.boxes.box_yattor import YattorReader
+from volta.benchmark.readers import FakeSerial
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = [50, 90, 99, 100]
+# readers are driven w/ reads of this many seconds of data, like a device w/ data arriving in real time
+READ_INTERVAL = 0.1
+
+
+class StubYattorLib(object):
+    """ Stub for libyattor.so ctypes library, serves synthetic amperes, at most `read_size` per read """
+
+    def __init__(self, sample_rate, duration, read_size=None):
+        self.samples = np.random.uniform(0, 1, int(sample_rate * duration)).astype(np.float32)
+        self.position = 0
+        self.read_size = read_size or len(self.samples)
+
+    def yattor_read_ampere(self, timeout, count, buffer_):
+        amount = min(count, self.read_size, len(self.samples) - self.position)
+        np.frombuffer(buffer_, dtype=np.float32, count=amount)[:] = \
+            self.samples[self.position:self.position + amount]
+        self.position += amount
+        return amount
+
+    def yattor_working(self):
+        return self.position < len(self.samples)
+
+
+class NullMetric(object):
+    """ data_session metric stub, drops everything """
+
+    def put(self, df):
+        pass
+
+
+def binary_reader(sample_rate, duration, zero_copy=False):
+    device = FakeSerial(sample_rate, duration, read_size=max(int(sample_rate * READ_INTERVAL), 1) * 2)
+    return BoxBinaryReader(device.open(), sample_rate, zero_copy=zero_copy), device
+
+
+def zero_copy_binary_reader(sample_rate, duration):
+    return binary_reader(sample_rate, duration, zero_copy=True)
+
+
+def plain_text_reader(sample_rate, duration):
+    # text samples are 4 bytes long in average w/ line breaks
+    device = FakeSerial(sample_rate, duration, text=True, read_size=max(int(sample_rate * READ_INTERVAL), 1) * 4)
+    return BoxPlainTextReader(device.open(), 64 * 1024), device
+
+
+def yattor_reader(sample_rate, duration):
+    lib = StubYattorLib(sample_rate, duration, max(int(sample_rate * READ_INTERVAL), 1))
+    return YattorReader(lib, sample_rate), None
+
+
+READERS = {
+    'binary': binary_reader,
+    'binary_zero_copy': zero_copy_binary_reader,
+    'plain_text': plain_text_reader,
+    'yattor': yattor_reader,
+}
+
+
+def latency_stats(latencies):
+    """ Latency percentiles, ms """
+    if not latencies:
+        return {}
+    values = np.percentile(np.array(latencies) * 1000, PERCENTILES)
+    return {'p%s_ms' % percentile: float(value) for percentile, value in zip(PERCENTILES, values)}
+
+
+def peak_rss():
+    """ Peak resident set size of the process, KiB (bytes on macOS) """
+    if not resource:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run(reader_type, sample_rate, duration=10, chop_ratio=1.0, trace_allocations=False):
+    """ Run pipeline stages one after another and measure each of them
+
+    stages
+        read: reader chunks from synthetic source, READ_INTERVAL of data per read
+        chop: TimeChopper slices from read chunks
+        sink: CurrentRouter to null metric (DataFrame conversion included)
+
+    TimeChopper holds the last slice till more data arrives, so one extra slice of data is read,
+    and chop and sink stages get `duration` seconds of slices
+
+    Returns:
+        dict: samples/sec and latency percentiles per stage, peak RSS and traced allocations
+    """
+    reader, device = READERS[reader_type](sample_rate, duration + chop_ratio)
+    expected = int(sample_rate * (duration + chop_ratio))
+    if trace_allocations and tracemalloc:
+        tracemalloc.start()
+    result = {
+        'reader': reader_type,
+        'sample_rate': sample_rate,
+        'duration': duration,
+    }
+    try:
+        chunks, latencies = [], []
+        samples = 0
+        start = time.time()
+        while samples < expected:
+            read_start = time.time()
+            chunk = reader._read_chunk()
+            latencies.append(time.time() - read_start)
+            if chunk is not None:
+                # readers may reuse output buffers
+                chunks.append(np.array(chunk))
+                samples += len(chunk)
+        result['read'] = dict(samples_per_sec=samples / max(time.time() - start, 1e-9), **latency_stats(latencies))
+    finally:
+        if device:
+            reader.source.close()
+            device.close()
+
+    slices, latencies = [], []
+    chopper = iter(TimeChopper(chunks, sample_rate, chop_ratio))
+    start = time.time()
+    while True:
+        chop_start = time.time()
+        try:
+            slices.append(next(chopper))
+        except StopIteration:
+            break
+        latencies.append(time.time() - chop_start)
+    samples = sum(len(chunk) for chunk in slices)
+    result['chop'] = dict(samples_per_sec=samples / max(time.time() - start, 1e-9), **latency_stats(latencies))
+
+    router = CurrentRouter(NullMetric())
+    latencies = []
+    start = time.time()
+    for chunk in slices:
+        put_start = time.time()
+        router.put(chunk)
+        latencies.append(time.time() - put_start)
+    result['sink'] = dict(samples_per_sec=samples / max(time.time() - start, 1e-9), **latency_stats(latencies))
+
+    if trace_allocations and tracemalloc:
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result['traced_memory_peak'] = peak
+        result['traced_memory_current'] = current
+    result['peak_rss'] = peak_rss()
+    return result
+
+
+def environment():
+    try:
+        version = pkg_resources.get_distribution("volta").version
+    except pkg_resources.DistributionNotFound:
+        version = None
+    return {
+        'volta': version,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'ts': int(time.time()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='volta pipeline throughput benchmark')
+    parser.add_argument(
+        '-r', '--readers', dest='readers', default=','.join(sorted(READERS)),
+        help='comma-separated readers list, available: %s' % ', '.join(sorted(READERS))
+    )
+    parser.add_argument(
+        '-s', '--sample-rates', dest='sample_rates', default='10000,100000,1000000',
+        help='comma-separated sample rates list'
+    )
+    parser.add_argument('-d', '--duration', dest='duration', type=float, default=10, help='seconds of data per run')
+    parser.add_argument('--chop-ratio', dest='chop_ratio', type=float, default=1.0)
+    parser.add_argument(
+        '-a', '--trace-allocations', dest='trace_allocations', action='store_true', default=False,
+        help='trace allocations w/ tracemalloc, slows benchmark down'
+    )
+    parser.add_argument('-o', '--output', dest='output', default='volta_benchmark.json')
+    args = parser.parse_args()
+
+    logging.basicConfig(level="INFO", format='%(asctime)s [%(levelname)s] [Volta benchmark] %(message)s')
+    results = []
+    for reader_type in args.readers.split(','):
+        if reader_type not in READERS:
+            raise RuntimeError('Unknown reader: %s' % reader_type)
+        for sample_rate in [int(rate) for rate in args.sample_rates.split(',')]:
+            result = run(reader_type, sample_rate, args.duration, args.chop_ratio, args.trace_allocations)
+            logger.info('%s', json.dumps(result, sort_keys=True))
+            results.append(result)
+    with open(args.output, 'w') as output:
+        json.dump({'environment': environment(), 'results': results}, output, indent=2, sort_keys=True)
+    logger.info('Results written to %s', args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+""" SyncFinder benchmarks
+
+Synthetic flash sequences in electrical currents w/ matching phone sync events
+"""
+import logging
+import time
+import numpy as np
+import pandas as pd
+from scipy import interpolate
+
+from volta.common.util import CurrentChunk, sample_timestamps
+from volta.listeners.sync.sync import SyncFinder, align_ts, DRIFT_TAIL_TIME
+from volta.benchmark.suite import NullMetric
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+logger = logging.getLogger(__name__)
+
+
+class StubConfig(object):
+    """ VoltaConfig stub, serves `sync` section options """
+
+    def __init__(self, **options):
+        self.options = {'search_interval': 30}
+        self.options.update(options)
+
+    def get_option(self, section, option, default=None):
+        return self.options.get(option, default)
+
+
+class StubCore(object):
+    """ Core stub w/ volta box sample rate, serves as data_session and its manager as well """
+
+    def __init__(self, sample_rate):
+        self.volta = type('StubVolta', (object,), {'sample_rate': sample_rate})()
+        self.data_session = self
+        self.manager = self
+
+    def subscribe(self, callback, metric_filter):
+        pass
+
+    def new_metric(self, meta):
+        return NullMetric()
+
+
+def flash_capture(
+        sample_rate, duration, start=3.21713, flashes=20, sys_uts_start=5 * 10 ** 6, seed=0, end_start=None, skew=0
+):
+    """ Currents w/ flash sequence starting at `start` seconds and phone sync events for it
+
+    Args:
+        end_start (float): start of the second flash sequence, seconds
+        skew (float): phone clock runs (1 + skew) times faster than box sample clock
+
+    Returns:
+        tuple: float32 currents, sync events DataFrame (sys_uts is `sys_uts_start` at currents start)
+    """
+    rng = np.random.RandomState(seed)
+    currents = rng.uniform(0, 100, int(sample_rate * duration)).astype(np.float32)
+    edges, messages = [], []
+    for sequence_start in [start] if end_start is None else [start, end_start]:
+        sample = int(sequence_start * sample_rate)
+        for _ in range(flashes):
+            length = int(rng.uniform(0.1, 0.6) * sample_rate)
+            currents[sample:sample + length] += 300
+            edges += [sample, sample + length]
+            messages += ['rise', 'fall']
+            sample += length + int(rng.uniform(0.1, 0.5) * sample_rate)
+    sys_uts = sys_uts_start + np.round(np.array(edges) * 10 ** 6 * (1 + skew) / sample_rate).astype(np.int64)
+    events = pd.DataFrame({
+        'custom_metric_type': 'sync',
+        'message': messages,
+        'sys_uts': sys_uts,
+        'log_uts': sys_uts - sys_uts_start,
+    })
+    return currents, events
+
+
+def current_chunks(currents, sample_rate, chop_ratio=1.0):
+    """ TimeChopper-like chunks of currents """
+    slice_size = int(sample_rate * chop_ratio)
+    return [
+        CurrentChunk(start, sample_timestamps(start, len(currents[start:start + slice_size]), sample_rate),
+                     currents[start:start + slice_size])
+        for start in range(0, len(currents), slice_size)
+    ]
+
+
+def append(df, other):
+    """ DataFrame.append, removed in pandas 2 """
+    if hasattr(df, 'append'):
+        return df.append(other)
+    return pd.concat([df, other])
+
+
+def legacy_sync_stage(chunks, events, sample_rate, search_interval=30):
+    """ Baseline sync stage, appends every chunk and events batch to accumulated DataFrames """
+    stage_df, sync_df = pd.DataFrame(), pd.DataFrame()
+    for chunk in chunks:
+        if len(stage_df) < search_interval * sample_rate:
+            stage_df = append(stage_df, chunk.to_dataframe())
+    for df in events:
+        sync_df = append(sync_df, df)
+    return stage_df, sync_df
+
+
+def preallocated_sync_stage(chunks, events, sample_rate, search_interval=30):
+    """ SyncFinder sync stage, preallocated currents array and sync events columns """
+    finder = SyncFinder(StubConfig(search_interval=search_interval), StubCore(sample_rate))
+    for chunk in chunks:
+        finder.put_current(chunk)
+    for df in events:
+        finder.put_syncs(df)
+    return finder
+
+
+def run_sync_stage(stage, sample_rate=1000000, duration=30, chop_ratio=1.0, batch=10):
+    """ Collect `duration` seconds of currents chunks and sync events in batches of `batch` events
+
+    Returns:
+        dict: elapsed time and peak traced memory
+    """
+    currents, events = flash_capture(sample_rate, duration)
+    chunks = current_chunks(currents, sample_rate, chop_ratio)
+    events = [events.iloc[idx:idx + batch] for idx in range(0, len(events), batch)]
+    if tracemalloc:
+        tracemalloc.start()
+    start = time.time()
+    stage(chunks, events, sample_rate, duration)
+    elapsed = time.time() - start
+    peak = None
+    if tracemalloc:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {
+        'sample_rate': sample_rate,
+        'duration': duration,
+        'elapsed': elapsed,
+        'peak_memory': peak,
+    }
+
+
+def legacy_ref_signal(sync):
+    """ Baseline reference signal, zero-order interp1d evaluated at every sample w/ np.linspace """
+    f = interpolate.interp1d(sync["sample_offset"], sync["message"], kind="zero")
+    X = np.linspace(0, sync["sample_offset"][-1], sync["sample_offset"][-1])
+    rs = f(X)
+    return rs - np.mean(rs)
+
+
+def run_ref_signal(ref_signal, sample_rate=1000000, duration=30):
+    """ Build reference signal for flash sequence sync events
+
+    Returns:
+        dict: elapsed time, peak traced memory, reference signal length and dtype
+    """
+    _, events = flash_capture(sample_rate, duration)
+    sys_uts = events.sys_uts.values
+    sync = {
+        'sample_offset': (sys_uts - sys_uts[0]) * sample_rate // 10 ** 6,
+        'message': events.message.map({'rise': 1, 'fall': 0}).values,
+    }
+    if tracemalloc:
+        tracemalloc.start()
+    start = time.time()
+    refsig = ref_signal(sync)
+    elapsed = time.time() - start
+    peak = None
+    if tracemalloc:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {
+        'sample_rate': sample_rate,
+        'elapsed': elapsed,
+        'peak_memory': peak,
+        'length': len(refsig),
+        'dtype': str(refsig.dtype),
+    }
+
+
+def run_search(sample_rate, decimation=1, duration=30, start=3.21713, **options):
+    """ Find sync points in `duration` seconds of currents w/ flash sequence at `start` seconds
+
+    Returns:
+        dict: elapsed time of find_sync_points, found sync sample and its error, samples
+    """
+    currents, events = flash_capture(sample_rate, duration, start)
+    finder = SyncFinder(
+        StubConfig(search_interval=duration, decimation=decimation, **options), StubCore(sample_rate)
+    )
+    for chunk in current_chunks(currents, sample_rate):
+        finder.put_current(chunk)
+    finder.put_syncs(events)
+    search_start = time.time()
+    sync_points = finder.find_sync_points()
+    return {
+        'sample_rate': sample_rate,
+        'decimation': decimation,
+        'elapsed': time.time() - search_start,
+        'sync_sample': int(sync_points['sync_sample']),
+        'error_samples': int(sync_points['sync_sample']) - int(start * sample_rate),
+    }
+
+
+def run_drift(sample_rate=10000, duration=600, skew=50e-6):
+    """ Estimate clock drift by flash sequences in the start and in the end of `duration` seconds of currents
+
+    Returns:
+        dict: estimated and true skew, misalignment of the last sync event w/ constant offset and w/ skew, us
+    """
+    end_start = duration - 25
+    currents, events = flash_capture(sample_rate, duration, end_start=end_start, skew=skew)
+    finder = SyncFinder(StubConfig(drift=True), StubCore(sample_rate))
+    for chunk in current_chunks(currents, sample_rate):
+        finder.put_current(chunk)
+    finder.put_syncs(events)
+    sync_points = finder.find_sync_points()
+    last_rise = events[events.message == 'rise'].iloc[-1]
+    true_ts = int(round((last_rise.sys_uts - 5 * 10 ** 6) / (1 + skew)))
+    return {
+        'sample_rate': sample_rate,
+        'duration': duration,
+        'skew': -skew / (1 + skew),
+        'estimated_skew': sync_points.get('sys_uts_skew'),
+        'offset_error_us': int(last_rise.sys_uts + sync_points['sys_uts_offset'] - true_ts),
+        'drift_corrected_error_us': int(align_ts(last_rise.sys_uts, sync_points) - true_ts),
+    }
+
+
+def check_online_sync(sample_rate=10000, duration=40, pace=0.1):
+    """ Feed currents and sync events as they arrive, one chunk every `pace` seconds, to online SyncFinder
+    and compare its sync points w/ batch search over the same data
+
+    Returns:
+        dict: seconds of currents put when online sync points became ready, sync sample difference
+    """
+    currents, events = flash_capture(sample_rate, duration)
+    event_samples = (events['sys_uts'].values - 5 * 10 ** 6) * sample_rate // 10 ** 6
+    online = SyncFinder(StubConfig(online=True), StubCore(sample_rate))
+    batch = SyncFinder(StubConfig(), StubCore(sample_rate))
+    ready_at, put_events = None, 0
+    for chunk in current_chunks(currents, sample_rate):
+        end = chunk.start + len(chunk)
+        for finder in [online, batch]:
+            finder.put_current(chunk)
+        arrived = int(np.searchsorted(event_samples, end))
+        if arrived > put_events:
+            for finder in [online, batch]:
+                finder.put_syncs(events.iloc[put_events:arrived])
+            put_events = arrived
+        if ready_at is None and online.sync_points:
+            ready_at = float(end) / sample_rate
+        time.sleep(pace)
+    if ready_at is None:
+        raise AssertionError('Online sync points were not ready while currents were arriving')
+    online_points, batch_points = online.find_sync_points(), batch.find_sync_points()
+    sample_us = 10 ** 6 // sample_rate + 1
+    if abs(online_points['sync_sample'] - batch_points['sync_sample']) > 1 or any(
+        abs(online_points[key] - batch_points[key]) > sample_us for key in ['sys_uts_offset', 'log_uts_offset']
+    ):
+        raise AssertionError('Online sync points differ from batch search: %s != %s' % (online_points, batch_points))
+    return {
+        'ready_at_sec': ready_at,
+        'duration': duration,
+        'sync_sample_diff': int(online_points['sync_sample'] - batch_points['sync_sample']),
+    }
+
+
+def check_drift_tail(sample_rate=1000, skew=50e-6):
+    """ Compare clock drift from chunks longer than the drift tail w/ drift from 1 s chunks,
+    the last sequence is in the middle of the last chunk
+    """
+    chunk_time = DRIFT_TAIL_TIME + 10
+    duration = 3 * chunk_time
+    currents, events = flash_capture(sample_rate, duration, end_start=duration - 25, skew=skew)
+    results = []
+    for chop_ratio in [1.0, chunk_time]:
+        finder = SyncFinder(StubConfig(drift=True), StubCore(sample_rate))
+        for chunk in current_chunks(currents, sample_rate, chop_ratio):
+            finder.put_current(chunk)
+        finder.put_syncs(events)
+        results.append(finder.find_sync_points())
+    if not results[0].get('sys_uts_skew') or results[0] != results[1]:
+        raise AssertionError('Clock drift from chunks longer than drift tail differs: %s != %s' % tuple(results))
+    return True
+
+
+def main():
+    logging.basicConfig(level="INFO", format='%(asctime)s [%(levelname)s] [Volta benchmark] %(message)s')
+    for name, stage in [('legacy', legacy_sync_stage), ('preallocated', preallocated_sync_stage)]:
+        logger.info('%s sync stage: %s', name, run_sync_stage(stage))
+    for name, ref_signal in [('legacy', legacy_ref_signal), ('direct', SyncFinder.ref_signal)]:
+        logger.info('%s reference signal: %s', name, run_ref_signal(ref_signal))
+    for sample_rate in [10000, 1000000]:
+        full = run_search(sample_rate)
+        logger.info('full-rate search: %s', full)
+        for decimation in [10, 100, 1000]:
+            if decimation * 10 > sample_rate:
+                continue
+            result = run_search(sample_rate, decimation)
+            result['speedup'] = full['elapsed'] / max(result['elapsed'], 1e-9)
+            result['diff_from_full_samples'] = result['sync_sample'] - full['sync_sample']
+            logger.info('coarse-to-fine search: %s', result)
+    for skew in [0, 20e-6, 100e-6]:
+        logger.info('clock drift: %s', run_drift(skew=skew))
+    logger.info('clock drift from chunks longer than drift tail: %s', check_drift_tail())
+    logger.info('online sync equivalent to batch search: %s', check_online_sync())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,12 @@
+import logging
+import os
+
 from netort.resource import manager as resource
 
+from volta.common.util import AcquisitionThread, RawCaptureWriter, ProcessLogParser
+
+logger = logging.getLogger(__name__)
+
 
 class VoltaBox(object):
     """ Volta box interface - parent class for volta boxes """
@@ -17,6 +24,11 @@ class VoltaBox(object):
             self.grab_timeout (int): timeout for grabber
             self.sample_rate (int): volta box sample rate - depends on software and which type of volta box you use
             self.baud_rate (int): baud rate for device if device specified in source
+            self.acquisition_thread (bool): read device in dedicated thread, see volta.common.util.AcquisitionThread
+            self.acquisition_queue_size (int): amount of chunks able to wait for processing
+            self.backpressure (string): policy if processing doesn't keep up: `block`, `drop_oldest` or `spill`
+            self.raw_capture (bool): record raw samples to memory-mapped file in artifacts dir,
+                see volta.common.util.RawCaptureWriter
         """
         self.core = core
         self.config = config
@@ -24,6 +36,7 @@ class VoltaBox(object):
         self.grabber_q = None
         self.process_currents = None
         self.reader = None
+        self.current_listeners = []
 
         self.source = config.get_option('volta', 'source')
         self.chop_ratio = config.get_option('volta', 'chop_ratio')
@@ -33,6 +46,12 @@ class VoltaBox(object):
         self.precision = config.get_option('volta', 'precision')
         self.power_voltage = config.get_option('volta', 'power_voltage')
         self.sample_swap = config.get_option('volta', 'sample_swap', False)
+        self.acquisition_thread = config.get_option('volta', 'acquisition_thread', False)
+        self.acquisition_queue_size = config.get_option('volta', 'acquisition_queue_size', 10)
+        self.backpressure = config.get_option('volta', 'backpressure', 'block')
+        self.acquisition = None
+        self.raw_capture = config.get_option('volta', 'raw_capture', False)
+        self.recorder = None
 
         # initialize data source
         try:
@@ -40,6 +59,54 @@ class VoltaBox(object):
         except Exception:
             raise RuntimeError('Device %s not found. Please check VoltaBox USB connection', self.source)
 
+    def subscribe(self, callback):
+        """ Subscribe callback to currents, callback receives volta.common.util.CurrentChunk """
+        self.current_listeners.append(callback)
+
+    def acquire(self, reader, buffer_size=0):
+        """ Source of chunks for processing stage: reader itself or acquisition thread reading it
+
+        Args:
+            reader: box reader, iterable of numpy.array chunks
+            buffer_size (int): expected chunk size, acquisition buffers are preallocated w/ it
+        """
+        if not self.acquisition_thread:
+            return reader
+        self.acquisition = AcquisitionThread(
+            reader,
+            queue_size=self.acquisition_queue_size,
+            backpressure=self.backpressure,
+            spill_dir=self.core.data_session.artifacts_dir,
+            buffer_size=buffer_size
+        )
+        logger.info('Starting acquisition thread...')
+        self.acquisition.start()
+        return self.acquisition
+
+    def create_recorder(self, dtype):
+        """ Raw capture recorder for box reader, None if raw capture disabled
+
+        Args:
+            dtype: type of raw samples box reader produces
+        """
+        if not self.raw_capture:
+            return None
+        self.recorder = RawCaptureWriter(
+            os.path.join(self.core.data_session.artifacts_dir, 'raw_capture.bin'),
+            dtype,
+            {
+                'type': self.config.get_option('volta', 'type'),
+                'sample_rate': self.sample_rate,
+                'precision': self.precision,
+                'slope': self.slope,
+                'offset': self.offset,
+                'power_voltage': self.power_voltage,
+                'start_time': self.core.data_session.start_time,
+            },
+            grow_size=self.sample_rate * 60
+        )
+        return self.recorder
+
     def start_test(self, results):
         """ Grab stage - starts grabber thread and puts data to results queue
 
@@ -59,9 +126,33 @@ class VoltaBox(object):
 class Phone(object):
     """ Phone interface - parent class for phones """
     def __init__(self, config, core):
-        """ Configure phone module """
+        """ Configure phone module
+
+        Attributes:
+            self.log_parser_process (bool): parse phone logs in worker process, see volta.common.util.ProcessLogParser
+        """
         self.config = config
         self.core = core
+        self.log_parser_process = config.get_option('phone', 'log_parser_process', False)
+        self.log_parser = None
+
+    def create_log_parser(self, source, parser_class, *args, **kwargs):
+        """ Phone logs parser: `parser_class(source, *args, **kwargs)` itself or worker process running it
+
+        Args:
+            source: queue of log lines
+            parser_class: LogParser or its subclass
+        """
+        if self.log_parser_process:
+            self.log_parser = ProcessLogParser(source, parser_class, *args, **kwargs)
+        else:
+            self.log_parser = parser_class(source, *args, **kwargs)
+        return self.log_parser
+
+    def close_log_parser(self):
+        """ Stop log parser worker process if any, it parses what has been read already """
+        if isinstance(self.log_parser, ProcessLogParser):
+            self.log_parser.close()
 
     def prepare(self):
         """ Phone preparements stage: install apps etc """
@@ -75,6 +166,10 @@ class Phone(object):
         """ App stage: run app/phone tests """
         raise NotImplementedError("Abstract method needs to be overridden")
 
+    def run_lightning(self):
+        """ Sync stage: run flashlight app once more, e.g. for clock drift estimation in the end of test """
+        logger.warning('%s can\'t run flashlight app, skipped', self.__class__.__name__)
+
     def end(self):
         """ Stop test and grabbers """
         raise NotImplementedError("Abstract method needs to be overridden")
@@ -9,102 +9,556 @@ import time
 import datetime
 import queue
 import re
+import os
+import tempfile
+import mmap
+import json
+import multiprocessing
+import select
+import heapq
+import signal
+from multiprocessing.pool import ThreadPool
 
 from netort.data_processing import get_nowait_from_queue
 
 
 logger = logging.getLogger(__name__)
 
+try:
+    monotonic = time.monotonic
+except AttributeError:  # python 2
+    monotonic = time.time
+
+
+class RingBuffer(object):
+    """
+    Fixed-capacity FIFO of samples backed by a preallocated numpy array.
+    Storage is reused between writes and only grows if a single write doesn't fit.
+
+    Attributes:
+        capacity (int): amount of samples buffer is able to hold w/o reallocation
+        reallocations (int): how many times the storage has been grown
+    """
+
+    def __init__(self, capacity, dtype=np.float32):
+        self.dtype = dtype
+        self.data = np.empty(max(int(capacity), 1), dtype=dtype)
+        self.head = 0
+        self.size = 0
+        self.reallocations = 0
+
+    @property
+    def capacity(self):
+        return len(self.data)
+
+    def __len__(self):
+        return self.size
+
+    def __grow(self, required):
+        capacity = self.capacity
+        while capacity < required:
+            capacity *= 2
+        data = np.empty(capacity, dtype=self.dtype)
+        size = self.size
+        self.get(size, out=data[:size])
+        self.data = data
+        self.head = 0
+        self.size = size
+        self.reallocations += 1
+
+    def put(self, chunk):
+        """ Append samples to the end of the buffer """
+        chunk_size = len(chunk)
+        if self.size + chunk_size > self.capacity:
+            self.__grow(self.size + chunk_size)
+        tail = (self.head + self.size) % self.capacity
+        first = min(chunk_size, self.capacity - tail)
+        self.data[tail:tail + first] = chunk[:first]
+        self.data[:chunk_size - first] = chunk[first:]
+        self.size += chunk_size
+
+    def get(self, amount, out=None):
+        """ Pop `amount` samples from the head of the buffer into `out` (new array if not specified) """
+        if amount > self.size:
+            raise ValueError('Unable to get %s samples, only %s buffered' % (amount, self.size))
+        if out is None:
+            out = np.empty(amount, dtype=self.dtype)
+        first = min(amount, self.capacity - self.head)
+        out[:first] = self.data[self.head:self.head + first]
+        out[first:amount] = self.data[:amount - first]
+        self.head = (self.head + amount) % self.capacity
+        self.size -= amount
+        return out
+
+
+def sample_timestamps(start_sample, amount, sample_rate):
+    """ Timestamps (us from test start) for `amount` samples starting w/ sample number `start_sample`
+
+    Computed from sample numbers in integer arithmetic, so there is no drift for sample rates
+    that don't divide 10^6 evenly.
+    """
+    return np.arange(start_sample, start_sample + amount, dtype=np.int64) * 10 ** 6 // sample_rate
+
+
+class CurrentChunk(object):
+    """ Columnar chunk of electrical currents
+
+    Attributes:
+        start (int): number of the first sample in chunk since test start
+        ts (numpy.array): int64 timestamps, us from test start
+        value (numpy.array): float32 currents
+    """
+    __slots__ = ('start', 'ts', 'value')
+
+    def __init__(self, start, ts, value):
+        self.start = start
+        self.ts = ts
+        self.value = value
+
+    def __len__(self):
+        return len(self.value)
+
+    def to_dataframe(self):
+        """ pandas.DataFrame, fmt: ['value', 'ts'] """
+        return pd.DataFrame({'value': self.value, 'ts': self.ts}, columns=['value', 'ts'])
+
+
+class SampleGap(object):
+    """ Discontinuity marker in stream of chunks: `samples` samples were lost before the next chunk """
+    __slots__ = ('samples',)
+
+    def __init__(self, samples):
+        self.samples = samples
+
+
+class CurrentRouter(object):
+    """ Drain destination for currents pipeline
+
+    Passes CurrentChunk to subscribed listeners as is,
+    converts it to DataFrame only for data_session metric.
+    Listener exceptions are logged and don't stop the pipeline, listener is unsubscribed
+    after `max_failures` failures in a row
+
+    Attributes:
+        failures (dict): listener -> failures in a row
+    """
+    max_failures = 10
+
+    def __init__(self, metric, listeners=None):
+        self.metric = metric
+        self.listeners = listeners if listeners is not None else []
+        self.failures = {}
+
+    def put(self, chunk):
+        for listener in list(self.listeners):
+            try:
+                listener(chunk)
+            except Exception:
+                self.failures[listener] = self.failures.get(listener, 0) + 1
+                logger.warning(
+                    'Currents listener %s failed (%s in a row)', listener, self.failures[listener], exc_info=True
+                )
+                if self.failures[listener] >= self.max_failures:
+                    logger.warning('Currents listener %s unsubscribed after %s failures', listener, self.max_failures)
+                    self.listeners.remove(listener)
+                    del self.failures[listener]
+            else:
+                self.failures.pop(listener, None)
+        self.metric.put(chunk.to_dataframe())
+
 
 class TimeChopper(object):
     """
-    Group incoming chunks into dataframe by sample rate w/ chop_ratio
-    adds utc timestamp from start test w/ offset and assigned frequency
+    Group incoming chunks into CurrentChunk by sample rate w/ chop_ratio
+    adds timestamp from start test w/ offset and assigned frequency
+
+    On SampleGap in source, buffered samples are sliced as a shorter chunk and sample counter skips lost samples,
+    so timestamps of the following chunks stay right
+
+    Attributes:
+        skipped_samples (int): lost samples skipped by SampleGap markers
     """
 
     def __init__(self, source, sample_rate, chop_ratio=1.0):
         self.source = source
         self.sample_rate = sample_rate
-        self.buffer = np.array([])
         self.chop_ratio = chop_ratio
         self.slice_size = int(self.sample_rate*self.chop_ratio)
+        self.buffer = RingBuffer(self.slice_size * 2)
+        self.skipped_samples = 0
 
     def __iter__(self):
         logger.debug('Chopper slicing data w/ %s ratio, slice size will be %s', self.chop_ratio, self.slice_size)
         sample_num = 0
         for chunk in self.source:
             # exec_time_start = time.time()
-            if chunk is not None:
+            if isinstance(chunk, SampleGap):
+                if len(self.buffer):
+                    ready_sample = self.buffer.get(len(self.buffer))
+                    ts = sample_timestamps(sample_num, len(ready_sample), self.sample_rate)
+                    yield CurrentChunk(sample_num, ts, ready_sample)
+                    sample_num = sample_num + len(ready_sample)
+                (logger.debug if self.skipped_samples else logger.warning)(
+                    'Chopper skips %s lost samples at sample %s', chunk.samples, sample_num
+                )
+                sample_num = sample_num + chunk.samples
+                self.skipped_samples += chunk.samples
+            elif chunk is not None:
                 logger.debug('Chopper got %s data', len(chunk))
-                self.buffer = np.append(self.buffer, chunk)
+                self.buffer.put(chunk)
                 while len(self.buffer) > self.slice_size:
-                    ready_sample = self.buffer[:self.slice_size]
-                    self.buffer = self.buffer[self.slice_size:]
-                    df = pd.DataFrame(data=ready_sample, columns=['value'])
-                    idx = "{value}{units}".format(
-                        value = int(10 ** 6 / self.sample_rate),
-                        units = "us"
-                    )
-                    # add time offset to start time in order to determine current timestamp and make date_range for df
-                    current_ts = int((sample_num * (1./self.sample_rate)) * 10 ** 9)
-                    df.loc[:, ('ts')] = pd.date_range(
-                        current_ts, periods=len(ready_sample), freq=idx
-                    ).astype(np.int64) // 1000
+                    ready_sample = self.buffer.get(self.slice_size)
+                    ts = sample_timestamps(sample_num, len(ready_sample), self.sample_rate)
+                    yield CurrentChunk(sample_num, ts, ready_sample)
                     sample_num = sample_num + len(ready_sample)
-                    yield df
             # logger.debug('Chopping took %s time', time.time() - exec_time_start)
 
 
+class AcquisitionThread(threading.Thread):
+    """
+    Read chunks from box reader in a dedicated thread and hand them over to processing stage
+    through bounded pool of preallocated buffers, so slow consumers don't stall device reads
+
+    Attributes:
+        queue_size (int): amount of chunks able to wait for processing stage
+        backpressure (string): what to do if processing stage doesn't keep up and there is no free buffer
+            `block`: wait for free buffer, device reads stall
+            `drop_oldest`: drop the oldest chunk waiting for processing, SampleGap marker w/ amount of dropped
+                samples goes to processing stage before the next chunk
+            `spill`: spill chunks to disk, processing stage reads them back in order
+        overruns (int): how many times there was no free buffer for incoming chunk
+        gaps (int): amount of SampleGap markers passed to processing stage
+    """
+    BACKPRESSURE_POLICIES = ('block', 'drop_oldest', 'spill')
+
+    def __init__(self, reader, queue_size=10, backpressure='block', spill_dir=None, buffer_size=0):
+        super(AcquisitionThread, self).__init__()
+        if backpressure not in self.BACKPRESSURE_POLICIES:
+            raise ValueError('Unknown backpressure policy: %s' % backpressure)
+        self.reader = reader
+        self.queue_size = queue_size
+        self.backpressure = backpressure
+        self.spill_dir = spill_dir
+        self.closed = False
+        self.setDaemon(True)
+        self.chunks = q.Queue()
+        self.free_buffers = q.Queue()
+        # one more buffer for the chunk being processed
+        for _ in range(self.queue_size + 1):
+            self.free_buffers.put(np.empty(buffer_size, dtype=np.float32))
+
+        self.spill_lock = threading.Lock()
+        self.spill_fname = None
+        self.spill_writer = None
+        self.spill_reader = None
+        self.spill_pending = 0
+        self.spill_chunk_size = buffer_size
+
+        # sample number of the next chunk read and of the next chunk expected by processing stage
+        self.read_samples = 0
+        self.expected_samples = 0
+        self.gaps = 0
+        self.overruns = 0
+        self.dropped_samples = 0
+        self.spilled_samples = 0
+        self.blocked_time = 0.0
+
+    def run(self):
+        try:
+            for chunk in self.reader:
+                if chunk is not None and len(chunk):
+                    self.__hand_over(chunk)
+        except Exception:
+            logger.error('Acquisition thread failed to read data', exc_info=True)
+        finally:
+            self.chunks.put(None)
+
+    def __hand_over(self, chunk):
+        if self.spill_pending:
+            # keep chunks order, processing stage takes spilled chunks after the queued ones
+            self.__spill(chunk)
+            return
+        try:
+            buffer_ = self.free_buffers.get_nowait()
+        except q.Empty:
+            self.overruns += 1
+            buffer_ = self.__overrun(chunk)
+            if buffer_ is None:
+                return
+        if len(buffer_) < len(chunk):
+            buffer_ = np.empty(len(chunk), dtype=np.float32)
+        buffer_[:len(chunk)] = chunk
+        self.chunks.put((buffer_, len(chunk), self.read_samples))
+        self.read_samples += len(chunk)
+
+    def __overrun(self, chunk):
+        """ Apply backpressure policy, returns free buffer or None if chunk was handled w/o it """
+        if self.backpressure == 'spill':
+            self.__spill(chunk)
+            return None
+        start = time.time()
+        while not self.closed:
+            if self.backpressure == 'drop_oldest':
+                try:
+                    buffer_, length, _ = self.chunks.get_nowait()
+                except q.Empty:
+                    pass
+                else:
+                    self.dropped_samples += length
+                    logger.debug('Acquisition queue overrun, dropped %s samples', length)
+                    return buffer_
+            try:
+                buffer_ = self.free_buffers.get(timeout=0.1)
+            except q.Empty:
+                continue
+            else:
+                self.blocked_time += time.time() - start
+                return buffer_
+        self.dropped_samples += len(chunk)
+        self.read_samples += len(chunk)
+        return None
+
+    def __spill(self, chunk):
+        with self.spill_lock:
+            if not self.spill_writer:
+                fd, self.spill_fname = tempfile.mkstemp(prefix='volta_spill_', suffix='.bin', dir=self.spill_dir)
+                os.close(fd)
+                logger.warning('Acquisition queue overrun, spilling data to %s', self.spill_fname)
+                self.spill_writer = open(self.spill_fname, 'ab')
+                self.spill_reader = open(self.spill_fname, 'rb', 0)
+            np.asarray(chunk, dtype=np.float32).tofile(self.spill_writer)
+            self.spill_writer.flush()
+            self.spill_pending += len(chunk)
+            self.spilled_samples += len(chunk)
+            self.read_samples += len(chunk)
+            self.spill_chunk_size = max(self.spill_chunk_size, len(chunk))
+
+    def __unspill(self):
+        with self.spill_lock:
+            chunk = np.fromfile(
+                self.spill_reader, dtype=np.float32, count=min(self.spill_pending, self.spill_chunk_size)
+            )
+            self.spill_pending -= len(chunk)
+            if not self.spill_pending:
+                # spill drained, start over
+                self.spill_writer.truncate(0)
+                self.spill_reader.seek(0)
+            return chunk
+
+    def __iter__(self):
+        while True:
+            try:
+                item = self.chunks.get(timeout=1) if not self.spill_pending else self.chunks.get_nowait()
+            except q.Empty:
+                if self.spill_pending:
+                    chunk = self.__unspill()
+                    self.expected_samples += len(chunk)
+                    yield chunk
+                continue
+            if item is None:
+                while self.spill_pending:
+                    chunk = self.__unspill()
+                    self.expected_samples += len(chunk)
+                    yield chunk
+                break
+            buffer_, length, start = item
+            if start > self.expected_samples:
+                self.gaps += 1
+                yield SampleGap(start - self.expected_samples)
+            self.expected_samples = start + length
+            yield buffer_[:length]
+            self.free_buffers.put(buffer_)
+        self.__remove_spill()
+
+    def __remove_spill(self):
+        with self.spill_lock:
+            if self.spill_writer:
+                self.spill_writer.close()
+                self.spill_reader.close()
+                os.remove(self.spill_fname)
+                self.spill_writer = None
+
+    def close(self):
+        self.closed = True
+        self.reader.close()
+
+    def get_info(self):
+        return {
+            'acquisition_queue_size': self.chunks.qsize(),
+            'acquisition_overruns': self.overruns,
+            'acquisition_dropped_samples': self.dropped_samples,
+            'acquisition_gaps': self.gaps,
+            'acquisition_spilled_samples': self.spilled_samples,
+            'acquisition_blocked_time': self.blocked_time,
+        }
+
+
+class RawCaptureWriter(object):
+    """
+    Append-only memory-mapped file for raw (uncalibrated) box samples
+
+    File format: fixed-size header (magic line + json meta, padded w/ spaces), then samples of `dtype`.
+    File grows by `grow_size` samples and is remapped when full, truncated to written samples on close.
+    Use `load_raw_capture` to reopen it w/ numpy.memmap
+    """
+    MAGIC = b'VOLTARAW'
+    HEADER_SIZE = 4096
+
+    def __init__(self, fname, dtype, meta, grow_size=10 ** 7):
+        self.fname = fname
+        self.dtype = np.dtype(dtype)
+        self.meta = dict(meta, dtype=self.dtype.str)
+        self.grow_size = grow_size
+        self.samples = 0
+        self.capacity = 0
+        self.mmap = None
+        self.data = None
+        self.closed = False
+        self.lock = threading.Lock()
+        header = self.MAGIC + b'\n' + json.dumps(self.meta, sort_keys=True).encode('utf-8')
+        if len(header) >= self.HEADER_SIZE:
+            raise ValueError('Raw capture meta is too long: %s' % self.meta)
+        self.file = open(self.fname, 'w+b')
+        self.file.write(header.ljust(self.HEADER_SIZE - 1, b' ') + b'\n')
+        self.file.flush()
+        logger.info('Recording raw capture to %s', self.fname)
+
+    def __unmap(self):
+        if self.mmap is not None:
+            # numpy view should be released before mmap close
+            self.data = None
+            self.mmap.close()
+            self.mmap = None
+
+    def __remap(self, required):
+        self.__unmap()
+        self.capacity = max(required, self.capacity + self.grow_size)
+        self.file.truncate(self.HEADER_SIZE + self.capacity * self.dtype.itemsize)
+        self.mmap = mmap.mmap(self.file.fileno(), 0)
+        self.data = np.frombuffer(self.mmap, dtype=self.dtype, count=self.capacity, offset=self.HEADER_SIZE)
+
+    def write(self, samples):
+        with self.lock:
+            if self.closed:
+                return
+            if self.samples + len(samples) > self.capacity:
+                self.__remap(self.samples + len(samples))
+            self.data[self.samples:self.samples + len(samples)] = samples
+            self.samples += len(samples)
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.__unmap()
+            self.file.truncate(self.HEADER_SIZE + self.samples * self.dtype.itemsize)
+            self.file.close()
+            logger.info('Raw capture %s closed, %s samples recorded', self.fname, self.samples)
+
+
+def load_raw_capture(fname):
+    """ Open raw capture recorded w/ RawCaptureWriter
+
+    Returns:
+        (dict, numpy.memmap): capture meta and read-only samples
+    """
+    with open(fname, 'rb') as capture:
+        header = capture.read(RawCaptureWriter.HEADER_SIZE)
+    magic, _, meta = header.partition(b'\n')
+    if magic != RawCaptureWriter.MAGIC:
+        raise ValueError('%s is not a volta raw capture' % fname)
+    meta = json.loads(meta.decode('utf-8'))
+    if os.path.getsize(fname) == RawCaptureWriter.HEADER_SIZE:
+        return meta, np.array([], dtype=meta['dtype'])
+    return meta, np.memmap(fname, dtype=meta['dtype'], mode='r', offset=RawCaptureWriter.HEADER_SIZE)
+
+
 class Executioner(object):
-    """ Process executioner and pipe reader """
+    """ Process executioner and pipe reader
+
+    One reader thread waits for stdout and stderr of the process w/ select, reads them in blocks
+    and puts complete lines to `out_queue` and `errors_queue` as soon as they arrive
+
+    Attributes:
+        block_size (int): max bytes per pipe read
+        close_timeout (float): seconds between reader thread checks of close signal while pipes are silent
+        interactive (bool): open stdin pipe of the process, see `write`
+    """
+    block_size = 64 * 1024
+    close_timeout = 0.5
+
     def __init__(
-            self, cmd, terminate_if_errors=False, shell=False
+            self, cmd, terminate_if_errors=False, shell=False, interactive=False
     ):
         self.cmd = shlex.split(cmd)
         self.terminate_if_errors = terminate_if_errors
         self.process = None
         self.shell = shell
+        self.interactive = interactive
         self.out_queue = queue.Queue()
         self.errors_queue = queue.Queue()
         self.closed = False
-        self.process_out_reader = None
-        self.process_err_reader = None
+        self.process_reader = None
 
     def execute(self):
         self.process = subprocess.Popen(
             self.cmd,
             shell=self.shell,
+            stdin=subprocess.PIPE if self.interactive else None,
             stderr=subprocess.PIPE,
             stdout=subprocess.PIPE,
             close_fds=True
         )
-        self.process_out_reader = threading.Thread(
-            target=self.__read_pipe, args=(self.process.stdout, self.out_queue)
-        )
-        self.process_out_reader.setDaemon(True)
-        self.process_err_reader = threading.Thread(
-            target=self.__read_pipe, args=(self.process.stderr, self.errors_queue)
-        )
-        self.process_err_reader.setDaemon(True)
-        self.process_out_reader.start()
-        self.process_err_reader.start()
+        self.process_reader = threading.Thread(target=self.__read_pipes)
+        self.process_reader.setDaemon(True)
+        self.process_reader.start()
         return self.out_queue, self.errors_queue
 
     def is_finished(self):
         return self.process.poll()
 
-    def __read_pipe(self, source, destination):
-        while not self.closed:
+    def wait(self, timeout=5):
+        """ Wait for process to finish and `timeout` seconds at most for the rest of its output to be read
+
+        Returns:
+            int: process retcode
+        """
+        self.process.wait()
+        if self.process_reader:
+            self.process_reader.join(timeout)
+        return self.process.returncode
+
+    def write(self, data):
+        """ Write bytes to stdin of interactive process """
+        self.process.stdin.write(data)
+        self.process.stdin.flush()
+
+    def __read_pipes(self):
+        """ Read stdout and stderr till EOF of both or close signal """
+        pipes = {
+            self.process.stdout.fileno(): self.out_queue,
+            self.process.stderr.fileno(): self.errors_queue,
+        }
+        tails = {fd: b'' for fd in pipes}
+        while pipes and not self.closed:
             try:
-                data = source.readline()
-            except ValueError:
-                logger.warning('Executioner %s pipe unexpectedly closed: %s', self.cmd, source, exc_info=True)
-                self.close()
-            else:
-                if data:
-                    destination.put(data)
-                else:
-                    time.sleep(1)
+                ready, _, _ = select.select(list(pipes), [], [], self.close_timeout)
+                for fd in ready:
+                    data = os.read(fd, self.block_size)
+                    if not data:
+                        # EOF, the last line may have no line break
+                        if tails[fd]:
+                            pipes[fd].put(tails[fd])
+                        del pipes[fd]
+                        continue
+                    lines = (tails[fd] + data).split(b'\n')
+                    tails[fd] = lines.pop()
+                    for line in lines:
+                        pipes[fd].put(line + b'\n')
+            except (OSError, ValueError, select.error):
+                logger.warning('Executioner %s pipes unexpectedly closed', self.cmd, exc_info=True)
+                break
 
     def close(self):
         if self.process:
@@ -113,11 +567,286 @@ class Executioner(object):
                 self.process.terminate()
                 self.process.wait()
         self.closed = True
-        self.process_out_reader.join()
-        self.process_err_reader.join()
+        if self.process_reader:
+            self.process_reader.join()
+
+
+class ShellSession(object):
+    """ Long-lived shell session, e.g. `adb shell`, runs batches of commands in one round-trip
+
+    Outputs of commands are delimited w/ marker lines printed by the shell itself. Commands run in subshells
+    w/o stdin, stderr is dropped. Session is restarted if it dies or doesn't answer in time.
+
+    Attributes:
+        timeout (float): seconds to wait for outputs of a batch
+    """
+
+    def __init__(self, cmd, timeout=10):
+        self.cmd = cmd
+        self.timeout = timeout
+        self.worker = None
+        self.out_q = None
+        self.batches = 0
+        self.restarts = 0
+        self.token = '%x' % int(time.time() * 10 ** 6)
+
+    def start(self):
+        self.close()
+        logger.info('Starting shell session: %s', self.cmd)
+        self.worker = Executioner(self.cmd, interactive=True)
+        self.out_q, _ = self.worker.execute()
+
+    def run(self, commands):
+        """ Run commands one by one in one round-trip
+
+        Returns:
+            list: stdout of each command w/o trailing line breaks, None if session failed
+        """
+        if self.worker is None or self.worker.is_finished() is not None:
+            if self.worker is not None:
+                self.restarts += 1
+            self.start()
+        self.batches += 1
+        markers, script = [], []
+        for num in range(len(commands)):
+            marker = '__volta_shellexec_{}_{}_{}'.format(self.token, self.batches, num)
+            markers.append(marker)
+            # quotes keep markers in echoed input (tty sessions) apart from printed ones,
+            # line break before end marker is for outputs w/o trailing line break
+            script.append(
+                'echo "{marker}""_start"; ( {cmd} ) </dev/null 2>/dev/null; echo; echo "{marker}""_end"'.format(
+                    marker=marker, cmd=commands[num]
+                )
+            )
+        starts = {marker + '_start': num for num, marker in enumerate(markers)}
+        last_end = markers[-1] + '_end'
+        outputs = [[] for _ in commands]
+        current = None
+        try:
+            self.worker.write(('\n'.join(script) + '\n').encode('utf-8'))
+            deadline = time.time() + self.timeout
+            while True:
+                line = self.out_q.get(timeout=max(deadline - time.time(), 0))
+                if isinstance(line, bytes):
+                    line = line.decode('utf-8', 'replace')
+                line = line.rstrip('\r\n')
+                if line in starts:
+                    current = starts[line]
+                elif line == last_end:
+                    break
+                elif line.endswith('_end') and line.startswith('__volta_shellexec_'):
+                    current = None
+                elif current is not None:
+                    outputs[current].append(line)
+        except (queue.Empty, IOError, OSError):
+            logger.warning('Shell session \'%s\' failed to run commands, restarting...', self.cmd)
+            logger.debug('Shell session \'%s\' failed', self.cmd, exc_info=True)
+            self.restarts += 1
+            self.start()
+            return
+        return ['\n'.join(output).strip('\n') for output in outputs]
+
+    def close(self):
+        if self.worker:
+            self.worker.close()
+            self.worker = None
+
+
+class ShellexecMetrics(threading.Thread):
+    """ Collects shellexec metrics in a thread, puts a DataFrame w/ 'ts' and 'value' to metric for every sample
+
+    Metrics are scheduled by deadlines in a heap, deadlines missed while previous samples were collected are skipped
+    and counted. Sample 'ts' is monotonic clock time, us from `start_time`.
+
+    Device commands of due metrics are run by scheduler thread in one round-trip, host commands are run concurrently
+    in a thread pool, one at a time per metric: deadline is skipped if previous sample of metric is still running.
+
+    Metric options:
+        cmd (string): host command, run in subprocess for every sample
+        device_cmd (string): command run in shell session, commands of all due metrics share one round-trip
+        interval (float): seconds between samples, default 1
+        timeout (float): seconds after which host command is killed, default 10
+
+    Attributes:
+        session (ShellSession): shell session for `device_cmd` metrics, e.g. `adb shell`
+        start_time (int): uts of test start (data_session start_time), us; thread start if None
+        close_timeout (float): max seconds between close signal checks
+    """
+    close_timeout = 0.5
+
+    def __init__(self, metrics, destinations, session_cmd, start_time=None):
+        super(ShellexecMetrics, self).__init__()
+        self.setDaemon(True)
+        self.metrics = metrics
+        self.destinations = destinations
+        self.session = ShellSession(session_cmd)
+        self.start_time = start_time
+        self.closed = False
+        self.intervals = {}
+        for key, value in metrics.items():
+            self.intervals[key] = float(value.get('interval', 1))
+            if self.intervals[key] <= 0:
+                raise ValueError('Shellexec metric %s interval should be positive: %s' % (key, value.get('interval')))
+        self.samples = {key: 0 for key in metrics}
+        self.missed_deadlines = {key: 0 for key in metrics}
+        self.max_lateness = {key: 0 for key in metrics}
+        self.timeouts = {key: 0 for key in metrics}
+        self.running = {}
+        self.running_lock = threading.Lock()
+        host_keys = [key for key, value in metrics.items() if not value.get('device_cmd')]
+        self.pool = ThreadPool(len(host_keys)) if host_keys else None
+        self.wall_start = None
+        self.clock_start = None
+
+    def run(self):
+        self.clock_start, self.wall_start = monotonic(), time.time()
+        if self.start_time is None:
+            self.start_time = int(self.wall_start * 10 ** 6)
+        schedule = [(self.clock_start, key) for key in sorted(self.metrics)]
+        heapq.heapify(schedule)
+        while schedule and not self.closed:
+            now = monotonic()
+            if schedule[0][0] > now:
+                time.sleep(min(schedule[0][0] - now, self.close_timeout))
+                continue
+            due = []
+            while schedule and schedule[0][0] <= now:
+                due.append(heapq.heappop(schedule))
+            for deadline, key in due:
+                self.max_lateness[key] = max(self.max_lateness[key], now - deadline)
+            self.collect([key for _, key in due])
+            finished = monotonic()
+            for deadline, key in due:
+                missed = int((finished - deadline) // self.intervals[key])
+                self.missed_deadlines[key] += missed
+                heapq.heappush(schedule, (deadline + (missed + 1) * self.intervals[key], key))
+        self.session.close()
+        if self.pool:
+            self.pool.close()
+            with self.running_lock:
+                for proc in self.running.values():
+                    if proc:
+                        self.kill(proc)
+
+    def timestamp(self, clock):
+        """ Monotonic clock time to us from start_time """
+        return int(round((self.wall_start + clock - self.clock_start) * 10 ** 6)) - self.start_time
+
+    def collect(self, keys):
+        """ Sample metrics: device commands in one session round-trip, host commands are sent to thread pool """
+        device_keys = [key for key in keys if self.metrics[key].get('device_cmd')]
+        if device_keys:
+            start = monotonic()
+            outputs = self.session.run([self.metrics[key]['device_cmd'] for key in device_keys])
+            # commands are fast, so the middle of round-trip is closer to sample time than its end
+            ts = (start + monotonic()) / 2
+            for key, output in zip(device_keys, outputs or []):
+                self.put(key, ts, output)
+        for key in keys:
+            if key in device_keys:
+                continue
+            with self.running_lock:
+                if key in self.running:
+                    self.missed_deadlines[key] += 1
+                    continue
+                self.running[key] = None
+            self.pool.apply_async(self.collect_host, (key,))
+
+    def collect_host(self, key):
+        """ Sample host command metric, runs in thread pool """
+        try:
+            output = self.execute(key)
+        except RuntimeError:
+            self.timeouts[key] += 1
+            logger.warning('Shellexec metric %s command timed out', key)
+        except Exception:
+            logger.warning('Failed to collect shellexec metric: %s', key)
+            logger.debug('Failed to collect shellexec metric: %s', key, exc_info=True)
+        else:
+            # commands still running on close are killed, their output is incomplete
+            if not self.closed:
+                self.put(key, monotonic(), output)
+        finally:
+            with self.running_lock:
+                self.running.pop(key, None)
+
+    def put(self, key, clock, value):
+        ts = self.timestamp(clock)
+        self.samples[key] += 1
+        self.destinations[key].put(
+            pd.DataFrame(
+                data={
+                    ts:
+                        {'ts': ts, 'value': value}
+                },
+            ).T
+        )
+
+    def execute(self, key):
+        """ Host command output of metric, RuntimeError if command is killed after metric timeout """
+        cmd = self.metrics[key].get('cmd')
+        timeout = float(self.metrics[key].get('timeout', 10))
+        # own process group, so that shell children are killed too and don't hold the pipes
+        proc = subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True, preexec_fn=os.setsid
+        )
+        with self.running_lock:
+            self.running[key] = proc
+            # started after scheduler killed running commands on close
+            if self.closed:
+                self.kill(proc)
+        expired = []
+
+        def expire():
+            expired.append(True)
+            self.kill(proc)
+        timer = threading.Timer(timeout, expire)
+        timer.start()
+        try:
+            (stdout, stderr) = proc.communicate()
+        finally:
+            timer.cancel()
+        if expired:
+            raise RuntimeError('Command timed out after %s s: %s' % (timeout, cmd))
+        if isinstance(stdout, bytes):
+            stdout = stdout.decode('utf-8', 'replace')
+        return stdout.strip('\n')
+
+    @staticmethod
+    def kill(proc):
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except OSError:
+            pass
+
+    def close(self):
+        self.closed = True
+
+    def get_info(self):
+        return {
+            'shellexec_samples': dict(self.samples),
+            'shellexec_missed_deadlines': dict(self.missed_deadlines),
+            'shellexec_max_lateness_ms': {key: value * 1000 for key, value in self.max_lateness.items()},
+            'shellexec_timeouts': dict(self.timeouts),
+            'shellexec_session_restarts': self.session.restarts,
+        }
 
 
 class LogParser(object):
+    """ Parses log lines from source queue w/ log format regexp
+
+    Yields one DataFrame per read batch, indexed by 'ts', w/ log format regexp groups,
+    'ts'/'sys_uts' (us from the first log entry) and custom event columns
+    'custom_metric_type', 'message', 'tag', 'log_uts' (None for non-custom entries)
+
+    Attributes:
+        read_timeout (float): seconds to wait for log lines in source queue before checking close signal
+        flush_timeout (float): seconds of source silence after which the last log entry is considered complete,
+            later continuation lines are dropped
+        prefilter (list): substrings, e.g. '[volta]' or tags. If set, lines w/o any of them are dropped
+            before log format regexp matching, multiline entries are cut at the first such line.
+            The first log entry is always parsed, it is 'ts' origin
+    """
     # data sample: [volta] 12345678 fragment TagFragment start
     # following regexp grabs 'nanotime', 'type', 'tag' and 'message' from sample above
     volta_custom_event = re.compile(
@@ -136,31 +865,80 @@ class LogParser(object):
         """, re.VERBOSE | re.IGNORECASE
     )
 
-    def __init__(self, source, log_fmt_regexp, phone_type, cache_size=10):
+    def __init__(self, source, log_fmt_regexp, phone_type, cache_size=10, prefilter=None):
         self.closed = False
         self.source = source
         self.log_fmt_regexp = log_fmt_regexp
         self.phone_type = phone_type
         self.buffer = []
         self.cache_size = cache_size
+        self.read_timeout = 0.5
+        self.flush_timeout = 0.02
+        self.prefilter = list(prefilter or [])
+        self.prefilter_bytes = [needle.encode('utf-8') for needle in self.prefilter]
+        self.origin_found = False
+        self.skipping = False
         self.log_uts_start = None
         self.sys_uts_start = None
+        self.timestamps = LogTimestampParser(phone_type)
+        self.columns = []
+        custom_columns = ['ts', 'sys_uts', 'custom_metric_type', 'message', 'tag', 'log_uts']
+        for column in self._log_fmt_groups() + custom_columns:
+            if column not in self.columns:
+                self.columns.append(column)
+
+    def _log_fmt_groups(self):
+        return list(self.log_fmt_regexp.groupindex)
+
+    def _match(self, line):
+        """ Log format groups of log line, None for continuation or trash lines """
+        match = self.log_fmt_regexp.match(line)
+        if match:
+            return match.groupdict()
+
+    def _get_lines(self):
+        """ Log lines from source, waits for the first one up to `flush_timeout` seconds if a log entry is buffered
+        and `read_timeout` seconds otherwise
+        """
+        try:
+            line = self.source.get(timeout=self.flush_timeout if self.buffer else self.read_timeout)
+        except queue.Empty:
+            return []
+        return [line] + get_nowait_from_queue(self.source)
+
+    def _flush(self):
+        """ Buffered log entry, source is silent and it won't get continuation lines """
+        log_entries, self.buffer = self.buffer, []
+        return log_entries
 
     def _read_chunk(self):
-        data = get_nowait_from_queue(self.source)
+        data = self._get_lines()
         if not data:
-            time.sleep(1)
+            return self._flush()
         else:
             ready_to_go_chunks = []
             for chunk in data:
-                match = self.log_fmt_regexp.match(chunk)
+                if self.prefilter and self.origin_found and not self._prefiltered(chunk):
+                    # do not hold kept log entry in buffer till the next kept line, it may be long
+                    if self.buffer:
+                        ready_to_go_chunks.append(self.buffer.pop(0))
+                    self.skipping = True
+                    continue
+                if isinstance(chunk, bytes):
+                    chunk = chunk.decode('utf-8', 'replace')
+                match = self._match(chunk)
+                if not match and self.skipping:
+                    # continuation line of dropped log entry
+                    continue
                 # we need this for multiline log entries concatenation
                 if match:
+                    self.origin_found = True
+                    self.skipping = False
                     if not self.buffer:
-                        self.buffer.append(match.groupdict())
+                        self.buffer.append(match)
                     else:
                         ready_to_go_chunk = self.buffer.pop(0)
-                        self.buffer.append(match.groupdict())
+                        self.buffer.append(match)
                         ready_to_go_chunks.append(ready_to_go_chunk)
                 else:
                     if not self.buffer:
@@ -169,66 +947,72 @@ class LogParser(object):
                         self.buffer[0]['value'] = self.buffer[0]['value'] + str(chunk)
             return ready_to_go_chunks
 
+    def _prefiltered(self, line):
+        """ Line has any of prefilter substrings """
+        needles = self.prefilter_bytes if isinstance(line, bytes) else self.prefilter
+        for needle in needles:
+            if needle in line:
+                return True
+        return False
+
     def __iter__(self):
         while not self.closed:
             log_entries = self._read_chunk()
             if log_entries:
-                for log_entry in log_entries:
-                    # exec_time_start = time.time()
-                    try:
-                        ts = self.__parse_timestamp(log_entry, self.phone_type)
-                        if ts:
-                            if not self.sys_uts_start:
-                                log_entry['ts'] = 0
-                                self.sys_uts_start = ts
-                            else:
-                                log_entry['ts'] = ts - self.sys_uts_start
-                        else:
-                            logger.debug('Timestamp of log entry malformed? %s', log_entry)
-                            continue
-                    except ValueError:
-                        continue
-                    else:
-                        log_entry = self.__parse_custom_message(log_entry)
-                        log_entry['sys_uts'] = log_entry['ts']
-                        log_entry['value'] = log_entry['value']\
-                            .replace('\t', '__tab__') \
-                            .replace('\n', '__nl__') \
-                            .replace('\r', '') \
-                            .replace('\f', '') \
-                            .replace('\v', '')
-                        df = pd.DataFrame(
-                            data={
-                                log_entry['ts']:
-                                    log_entry
-                            },
-                        ).T
-                        df.loc[:, ('value')] = df['value'].astype(np.str)
-                        yield df
-                    # logger.debug('log event parsing took %s time', time.time() - exec_time_start)
-            else:
-                time.sleep(0.5)
+                df = self._parse_batch(log_entries)
+                if df is not None:
+                    yield df
 
-    @staticmethod
-    def __parse_timestamp(log_entry, phone_type):
-        """ split chunks by LF, parse contents and create dataframes
+    def _parse_batch(self, log_entries):
+        """ Parse log entries to columnar lists and make one DataFrame of them
+
+        Returns:
+            pandas.DataFrame or None if there are no valid entries in batch
+        """
+        columns = {column: [] for column in self.columns}
+        for log_entry, ts in zip(log_entries, self.timestamps.parse_batch(log_entries)):
+            log_entry = self._parse_entry(log_entry, ts)
+            if log_entry is None:
+                continue
+            for column, values in columns.items():
+                values.append(log_entry.get(column))
+        if not columns['ts']:
+            return
+        # object columns keep None and ints of custom event columns as per-entry DataFrames did,
+        # w/o them mixed batches turn log_uts into float64 and None into NaN
+        df = pd.DataFrame(columns, index=columns['ts'], columns=self.columns, dtype=object)
+        df['ts'] = df['ts'].astype(np.int64)
+        df['sys_uts'] = df['sys_uts'].astype(np.int64)
+        df['value'] = df['value'].astype(str)
+        return df
+
+    def _parse_entry(self, log_entry, ts):
+        """ Add timestamps and custom event fields to log entry
 
         Args:
-            data (string): chunk of data read from source
+            ts (int): log entry uts, None if malformed
         Returns:
-            pandas.DataFrame, fmt: ['sys_uts', 'message']
+            dict or None for malformed log entries
         """
-        formatter = {
-            'android': format_ts_from_android, 'abro': format_ts_from_android,
-            'iphone': format_ts_from_iphone
-        }
-        try:
-            ts = formatter[phone_type](log_entry)
-        except (ValueError, IndexError):
-            logger.debug('Malformed data in logs: %s', log_entry, exc_info=True)
+        if not ts:
+            logger.debug('Timestamp of log entry malformed? %s', log_entry)
             return
+        if not self.sys_uts_start:
+            log_entry['ts'] = 0
+            self.sys_uts_start = ts
         else:
-            return int((ts - datetime.datetime(1970, 1, 1)).total_seconds() * 10 ** 6)
+            log_entry['ts'] = ts - self.sys_uts_start
+        log_entry = self.__parse_custom_message(log_entry)
+        if log_entry is None:
+            return
+        log_entry['sys_uts'] = log_entry['ts']
+        log_entry['value'] = log_entry['value']\
+            .replace('\t', '__tab__') \
+            .replace('\n', '__nl__') \
+            .replace('\r', '') \
+            .replace('\f', '') \
+            .replace('\v', '')
+        return log_entry
 
     def __parse_custom_message(self, log_entry):
         """
@@ -267,6 +1051,128 @@ class LogParser(object):
         self.closed = True
 
 
+class EpochLogParser(LogParser):
+    """ Parses `adb logcat -v epoch` lines w/o regexps and strptime
+
+    Sample line: `1549973532.121  1234  5678 I ActivityManager: message`. Gives the same 'sys_uts' and 'value'
+    as LogParser w/ default android log format regexp, 'uts' column holds epoch timestamp instead of 'date'/'time'
+    """
+
+    def __init__(self, source, phone_type='android', cache_size=10, prefilter=None):
+        super(EpochLogParser, self).__init__(source, None, phone_type, cache_size, prefilter)
+        self.timestamps = EpochTimestampParser()
+
+    def _log_fmt_groups(self):
+        return ['uts', 'value']
+
+    def _match(self, line):
+        fields = line.split(None, 5)
+        if len(fields) < 6:
+            return
+        seconds, _, fraction = fields[0].partition('.')
+        if not (seconds.isdigit() and fraction.isdigit()):
+            return
+        value = fields[5]
+        if value.endswith('\n'):
+            value = value[:-1]
+        return {'uts': fields[0], 'value': value}
+
+
+class ProcessLogParser(object):
+    """ Runs log parser in a separate worker process, so regexps and DataFrames don't take GIL of box pipeline
+
+    Log lines batches from source queue are sent to worker through a pipe, worker parses them w/
+    `parser_class(queue, *args, **kwargs)` and sends parsed DataFrames back, one per read batch.
+    Yields the same DataFrames as `parser_class` would.
+
+    Attributes:
+        join_timeout (float): seconds to wait for worker to finish parsing on close, terminated then
+    """
+
+    def __init__(self, source, parser_class, *args, **kwargs):
+        self.closed = False
+        self.source = source
+        self.parser_class = parser_class
+        self.args = args
+        self.kwargs = kwargs
+        self.join_timeout = 5
+        self.read_timeout = 0.5
+        self.process = None
+        self.conn = None
+        self.feeder = None
+
+    def start(self):
+        self.conn, worker_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=log_parser_worker, args=(worker_conn, self.parser_class, self.args, self.kwargs)
+        )
+        self.process.daemon = True
+        self.process.start()
+        worker_conn.close()
+        logger.info('%s worker process started, pid %s', self.parser_class.__name__, self.process.pid)
+        self.feeder = threading.Thread(target=self.__feed)
+        self.feeder.setDaemon(True)
+        self.feeder.start()
+
+    def __feed(self):
+        """ Send log lines to worker as soon as they arrive, None in the end """
+        try:
+            while not self.closed:
+                try:
+                    line = self.source.get(timeout=self.read_timeout)
+                except queue.Empty:
+                    continue
+                self.conn.send([line] + get_nowait_from_queue(self.source))
+            # worker parses everything sent and closes the pipe
+            self.conn.send(None)
+        except (IOError, OSError):
+            logger.warning('%s worker process pipe closed', self.parser_class.__name__, exc_info=True)
+
+    def __iter__(self):
+        if self.process is None:
+            self.start()
+        try:
+            while True:
+                yield self.conn.recv()
+        except EOFError:
+            if not self.closed:
+                logger.error('%s worker process unexpectedly finished', self.parser_class.__name__)
+
+    def close(self):
+        self.closed = True
+        if self.feeder:
+            self.feeder.join(self.join_timeout)
+        if self.process:
+            self.process.join(self.join_timeout)
+            if self.process.is_alive():
+                logger.warning('%s worker process is still alive, terminating...', self.parser_class.__name__)
+                self.process.terminate()
+
+
+def log_parser_worker(conn, parser_class, args, kwargs):
+    """ ProcessLogParser worker process loop: log lines batches in, parsed DataFrames out, None to finish """
+    source = queue.Queue()
+    parser = parser_class(source, *args, **kwargs)
+    while True:
+        if parser.buffer and not conn.poll(parser.flush_timeout):
+            log_entries = parser._flush()
+        else:
+            try:
+                data = conn.recv()
+            except EOFError:
+                break
+            if data is None:
+                break
+            for line in data:
+                source.put(line)
+            log_entries = parser._read_chunk()
+        if log_entries:
+            df = parser._parse_batch(log_entries)
+            if df is not None:
+                conn.send(df)
+    conn.close()
+
+
 def format_ts_from_android(log_entry):
     # android fmt, sample: 02-12 12:12:12.121
     return datetime.datetime.strptime(
@@ -292,7 +1198,180 @@ def format_ts_from_iphone(log_entry):
     )
 
 
+class LogTimestampParser(object):
+    """ Cached log timestamps parser, uts the same as format_ts_from_android/format_ts_from_iphone give
+
+    Android `MM-DD HH:MM:SS.mmm` timestamps are parsed by fixed positions, vectorized for batches,
+    epoch days are memoized by (month, day), year is taken once per parser.
+    Unusual timestamps fall back to strptime formatters.
+    """
+    MONTHS = {
+        month.lower(): num for num, month in enumerate(
+            ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'], 1
+        )
+    }
+    EPOCH = datetime.datetime(1970, 1, 1)
+    # digit positions in android 'MM-DD' and 'HH:MM:SS.mmm'
+    DATE_DIGITS = [0, 1, 3, 4]
+    TIME_DIGITS = [0, 1, 3, 4, 6, 7, 9, 10, 11]
+
+    def __init__(self, phone_type, year=None):
+        formatters = {
+            'android': format_ts_from_android, 'abro': format_ts_from_android,
+            'iphone': format_ts_from_iphone
+        }
+        if phone_type not in formatters:
+            raise ValueError('Unknown phone type for log timestamps: %s' % phone_type)
+        self.phone_type = phone_type
+        self.formatter = formatters[phone_type]
+        self.year = year or datetime.datetime.now().year
+        self.epoch_days = {}
+
+    def epoch_day(self, month, day):
+        """ Days since epoch for month and day of parser's year """
+        try:
+            return self.epoch_days[(month, day)]
+        except KeyError:
+            epoch_day = (datetime.date(self.year, month, day) - self.EPOCH.date()).days
+            self.epoch_days[(month, day)] = epoch_day
+            return epoch_day
+
+    def parse(self, log_entry):
+        """ Log entry uts
+
+        Raises:
+            ValueError: malformed timestamp
+        """
+        try:
+            if self.phone_type == 'iphone':
+                month, day = self.MONTHS[log_entry['month'].lower()], log_entry['date']
+                hours, minutes, seconds = log_entry['time'].split(':')
+                usec = 0
+                if not (day.isdigit() and len(day) <= 2):
+                    raise ValueError(day)
+                day = int(day)
+            else:
+                date, time_ = log_entry['date'], log_entry['time']
+                if len(date) != 5 or date[2] != '-' or len(time_) != 12 or time_[8] != '.' \
+                        or not (date[:2].isdigit() and date[3:].isdigit()):
+                    raise ValueError(date, time_)
+                month, day = int(date[:2]), int(date[3:])
+                hours, minutes, seconds = time_[:8].split(':')
+                usec = time_[9:]
+                if not usec.isdigit():
+                    raise ValueError(usec)
+                usec = int(usec) * 1000
+            for value in (hours, minutes, seconds):
+                if not (value.isdigit() and len(value) <= 2):
+                    raise ValueError(value)
+            hours, minutes, seconds = int(hours), int(minutes), int(seconds)
+            if hours > 23 or minutes > 59 or seconds > 59:
+                raise ValueError(hours, minutes, seconds)
+            epoch_day = self.epoch_day(month, day)
+        except (ValueError, KeyError, AttributeError, TypeError):
+            return self.__parse_with_formatter(log_entry)
+        return (((epoch_day * 24 + hours) * 60 + minutes) * 60 + seconds) * 10 ** 6 + usec
+
+    def __parse_with_formatter(self, log_entry):
+        try:
+            ts = self.formatter(log_entry).replace(year=self.year)
+        except (ValueError, IndexError, TypeError):
+            raise ValueError('Malformed timestamp in log entry: %s' % log_entry)
+        delta = ts - self.EPOCH
+        return (delta.days * 86400 + delta.seconds) * 10 ** 6 + delta.microseconds
+
+    def parse_batch(self, log_entries):
+        """ Log entries uts
+
+        Returns:
+            list: uts, None for malformed timestamps
+        """
+        timestamps = [None] * len(log_entries)
+        valid = np.zeros(len(log_entries), dtype=bool)
+        if self.phone_type != 'iphone' and log_entries:
+            try:
+                valid, uts = self.__parse_android_batch(log_entries)
+            except (UnicodeEncodeError, ValueError, KeyError, TypeError, AttributeError):
+                valid = np.zeros(len(log_entries), dtype=bool)
+            else:
+                for idx in np.flatnonzero(valid):
+                    timestamps[idx] = int(uts[idx])
+        for idx in np.flatnonzero(~valid):
+            try:
+                timestamps[idx] = self.parse(log_entries[idx])
+            except ValueError:
+                logger.debug('Malformed data in logs: %s', log_entries[idx], exc_info=True)
+        return timestamps
+
+    def __parse_android_batch(self, log_entries):
+        """ Vectorized fixed-position parsing of 'MM-DD' dates and 'HH:MM:SS.mmm' times
+
+        Returns:
+            tuple: mask of parsed entries, uts
+        """
+        amount = len(log_entries)
+        dates = np.frombuffer(''.join([entry['date'] for entry in log_entries]).encode('ascii'), dtype=np.uint8)
+        times = np.frombuffer(''.join([entry['time'] for entry in log_entries]).encode('ascii'), dtype=np.uint8)
+        if len(dates) != 5 * amount or len(times) != 12 * amount:
+            raise ValueError('Not fixed-width timestamps in batch')
+        dates = dates.reshape(amount, 5).astype(np.int64) - ord('0')
+        times = times.reshape(amount, 12).astype(np.int64) - ord('0')
+        valid = (dates[:, 2] == ord('-') - ord('0')) & (times[:, 2] == ord(':') - ord('0')) & \
+            (times[:, 5] == ord(':') - ord('0')) & (times[:, 8] == ord('.') - ord('0'))
+        valid &= ((dates[:, self.DATE_DIGITS] >= 0) & (dates[:, self.DATE_DIGITS] <= 9)).all(axis=1)
+        valid &= ((times[:, self.TIME_DIGITS] >= 0) & (times[:, self.TIME_DIGITS] <= 9)).all(axis=1)
+        month, day = dates[:, 0] * 10 + dates[:, 1], dates[:, 3] * 10 + dates[:, 4]
+        hours, minutes, seconds = times[:, 0] * 10 + times[:, 1], times[:, 3] * 10 + times[:, 4], \
+            times[:, 6] * 10 + times[:, 7]
+        msec = times[:, 9] * 100 + times[:, 10] * 10 + times[:, 11]
+        valid &= (hours <= 23) & (minutes <= 59) & (seconds <= 59)
+
+        epoch_days = np.zeros(amount, dtype=np.int64)
+        keys = month * 100 + day
+        for key in np.unique(keys[valid]):
+            try:
+                epoch_days[keys == key] = self.epoch_day(int(key) // 100, int(key) % 100)
+            except ValueError:
+                valid &= keys != key
+        uts = (((epoch_days * 24 + hours) * 60 + minutes) * 60 + seconds) * 10 ** 6 + msec * 1000
+        return valid, uts
+
+
+class EpochTimestampParser(object):
+    """ Log entries uts from `seconds.fraction` epoch timestamps in 'uts' field """
+
+    @staticmethod
+    def parse(log_entry):
+        """ Log entry uts
+
+        Raises:
+            ValueError: malformed timestamp
+        """
+        seconds, _, fraction = log_entry.get('uts', '').partition('.')
+        if not seconds.isdigit() or not (fraction.isdigit() or fraction == '') or len(fraction) > 6:
+            raise ValueError('Malformed timestamp in log entry: %s' % log_entry)
+        return int(seconds) * 10 ** 6 + int(fraction.ljust(6, '0'))
+
+    def parse_batch(self, log_entries):
+        """ Log entries uts
+
+        Returns:
+            list: uts, None for malformed timestamps
+        """
+        timestamps = []
+        for log_entry in log_entries:
+            try:
+                timestamps.append(self.parse(log_entry))
+            except ValueError:
+                logger.debug('Malformed data in logs: %s', log_entry, exc_info=True)
+                timestamps.append(None)
+        return timestamps
+
+
 def string_to_np(data, type=np.uint16, sep=""):
+    if not sep:
+        # binary mode of np.fromstring is deprecated
+        return np.frombuffer(data, dtype=type)
     chunk = np.fromstring(data, dtype=type, sep=sep)
     return chunk
 
@@ -39,6 +39,7 @@ class Factory(object):
             'binary': boxes.VoltaBoxBinary,
             'stm32': boxes.VoltaBoxStm32,
             'yattor': boxes.YattorBox,
+            'replay': boxes.VoltaBoxReplay,
         }
         self.phones = {
             'android': phones.AndroidPhone,
@@ -202,9 +203,12 @@ class Core(object):
         if 'sync' in self.config_enabled:
             self.enabled_modules.append(self.sync)
             self.sync.sample_rate = self.volta.sample_rate
+            self.volta.subscribe(self.sync.put_current)
 
         if 'console' in self.config_enabled:
             self.enabled_modules.append(self.console)
+            if 'volta' in self.config_enabled:
+                self.volta.subscribe(self.console.put)
 
     def start_test(self):
         """ Start test: start grabbers and process data to listeners """
@@ -224,6 +228,9 @@ class Core(object):
         Interrupts test: stops grabbers and events parsers
         """
         logger.info('Stopping test...')
+        if 'phone' in self.config_enabled and 'sync' in self.config_enabled and self.sync.drift:
+            logger.info('Flashing once more for clock drift estimation...')
+            self.phone.run_lightning()
         if 'volta' in self.config_enabled:
             self.volta.end_test()
         if 'phone' in self.config_enabled:
@@ -244,7 +251,11 @@ class Core(object):
                 dict(
                     sys_uts_offset=self.sync_points.get('offset') or self.sync_points.get('sys_uts_offset'),
                     log_uts_offset=self.sync_points.get('log_offset') or self.sync_points.get('log_uts_offset'),
-                    sync_sample=self.sync_points.get('sync_sample')
+                    sync_sample=self.sync_points.get('sync_sample'),
+                    sys_uts_skew=self.sync_points.get('sys_uts_skew'),
+                    log_uts_skew=self.sync_points.get('log_uts_skew'),
+                    sync_sys_uts=self.sync_points.get('sync_sys_uts'),
+                    sync_log_uts=self.sync_points.get('sync_log_uts')
                 )
             )
 
@@ -273,7 +284,11 @@ class Core(object):
                 task=self.config.get_option('uploader', 'task'),
                 sys_uts_offset=self.sync_points.get('sys_uts_offset', None),
                 log_uts_offset=self.sync_points.get('log_uts_offset', None),
-                sync_sample=self.sync_points.get('sync_sample', None)
+                sync_sample=self.sync_points.get('sync_sample', None),
+                sys_uts_skew=self.sync_points.get('sys_uts_skew', None),
+                log_uts_skew=self.sync_points.get('log_uts_skew', None),
+                sync_sys_uts=self.sync_points.get('sync_sys_uts', None),
+                sync_log_uts=self.sync_points.get('sync_log_uts', None)
             )
         self.data_session.update_job(job_meta)
         # setting metric offsets in luna
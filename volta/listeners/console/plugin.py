@@ -25,22 +25,22 @@ class ConsoleListener(DataListener):
             'fragment': ['sys_uts', 'log_uts', 'app', 'tag', 'message'],
             'unknown': ['sys_uts', 'message']
         }
-        self.core.data_session.manager.subscribe(self.put, {'type': 'metrics', 'name': 'current'})
 
     def get_info(self):
         """ mock """
         pass
 
-    def put(self, df):
+    def put(self, chunk):
         """ Process data
 
         Args:
-            df (pandas.DataFrame): dfs w/ data contents,
-                differs for each data type.
-                Should be processed differently from each other
+            chunk (volta.common.util.CurrentChunk): currents from VoltaBox
         """
-        if not self.closed:
-            logger.info("\n%s\n", df.describe())
+        if not self.closed and len(chunk):
+            logger.info(
+                "currents: count %s, mean %.3f, std %.3f, min %.3f, max %.3f",
+                len(chunk), chunk.value.mean(), chunk.value.std(), chunk.value.min(), chunk.value.max()
+            )
 
     def close(self):
         self.closed = True
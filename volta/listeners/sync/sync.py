@@ -3,15 +3,23 @@
 import numpy as np
 import pandas as pd
 import logging
-from scipy import interpolate
+import threading
+import time
 from scipy import signal
 
 from volta.common.interfaces import DataListener
-
-pd.options.mode.chained_assignment = None
+from volta.common.util import sample_timestamps
 
 logger = logging.getLogger(__name__)
 
+# seconds w/o new sync events before online sync (re)builds reference signal
+SYNC_SETTLE_TIME = 1.0
+# peak-to-sidelobe ratio of cross-correlation below this one means ambiguous sync
+SYNC_MIN_PSLR = 1.5
+# min seconds of currents kept in the end of test for clock drift: phone waits 15 s for flashlight app
+# after its start, the rest is margin for app launch and box stop
+DRIFT_TAIL_TIME = 30
+
 
 class SyncFinder(DataListener):
     """ Calculates sync points for volta current measurements and phone system logs
@@ -19,13 +27,38 @@ class SyncFinder(DataListener):
     Attributes:
         search_interval (int): amount of seconds will be used for sync (searching for sync events)
         sample_rate (int): volta box sample rate - depends on software and which type of volta box you use
+        online (bool): correlate incrementally in worker thread while currents and sync events arrive,
+            so sync points are ready as soon as search interval is filled up
+        decimation (int): search coarse offset at sample_rate / decimation first,
+            then refine it at full sample rate around the coarse peak. 1 means full-rate search
+        drift (bool): estimate linear clock skew between phone and volta box
+            by the last flash sequence in the end of test
     """
     def __init__(self, config, core):
         super(SyncFinder, self).__init__(config, core)
         self.search_interval = config.get_option('sync', 'search_interval')
+        self.online = config.get_option('sync', 'online', False)
+        self.decimation = config.get_option('sync', 'decimation', 1)
+        self.drift = config.get_option('sync', 'drift', False)
         self.sample_rate = None
-        self.sync_df = pd.DataFrame()
-        self.volta_sync_stage_df = pd.DataFrame()
+        self.sync_events = {'sys_uts': [], 'log_uts': [], 'message': []}
+        self.currents = None
+        self.currents_start = 0
+        self.currents_len = 0
+        self.tail = None
+        self.received = 0
+        self.next_sample = None
+        self.lock = threading.Lock()
+        self.sync_changed = None
+        self.correlator = None
+        self.correlated = 0
+        self.online_sync = None
+        self.currents_ready = threading.Event()
+        self.worker = None
+        self.worker_stopped = False
+        self.sync_points = {}
+        self.edge_residuals = None
+        self.my_metrics = {}
         self.core.data_session.manager.subscribe(
             self.put_syncs,
             {
@@ -33,17 +66,9 @@ class SyncFinder(DataListener):
                 'source': 'phone'
             }
         )
-        self.core.data_session.manager.subscribe(
-            self.put_current,
-            {
-                'type': 'metrics',
-                'name': 'current',
-                'source': 'voltabox'
-            }
-        )
 
     def put_syncs(self, incoming_df):
-        """ Append sync chunks to sync dataframe
+        """ Append sync events to sync events columns
         """
         try:
             gb = incoming_df.groupby('custom_metric_type')
@@ -52,94 +77,433 @@ class SyncFinder(DataListener):
         else:
             for name, df in gb:
                 if name == 'sync':
-                    self.sync_df = self.sync_df.append(df)
+                    with self.lock:
+                        for column, values in self.sync_events.items():
+                            values.extend(df[column].tolist())
+                        self.sync_changed = time.time()
+
+    def put_current(self, chunk):
+        """  Collect currents to preallocated sync stage until search interval won't will be filled up
+
+        Runs in box data thread, so it only copies currents; online correlation is signalled to worker thread
+
+        Args:
+            chunk (volta.common.util.CurrentChunk): currents from VoltaBox
+        """
+        with self.lock:
+            if self.currents is None:
+                # box may update sample rate on start, e.g. after handshake
+                self.sample_rate = self.core.volta.sample_rate
+                self.currents = np.empty(self.sync_stage_size, dtype=np.float32)
+                self.currents_start = chunk.start
+                if self.drift:
+                    self.tail = np.empty(self.drift_tail_size, dtype=np.float32)
+                if self.online:
+                    self.worker = threading.Thread(target=self.__correlation_worker, name='SyncFinder')
+                    self.worker.setDaemon(True)
+                    self.worker.start()
+            values = chunk.value
+            if self.next_sample is not None and chunk.start > self.next_sample and len(values):
+                # samples lost by acquisition, hold the first value over them so sample offsets stay right
+                values = np.concatenate(
+                    (np.full(chunk.start - self.next_sample, values[0], dtype=np.float32), values)
+                )
+            self.next_sample = chunk.start + len(chunk)
+            amount = min(len(values), len(self.currents) - self.currents_len)
+            if amount > 0:
+                self.currents[self.currents_len:self.currents_len + amount] = values[:amount]
+                self.currents_len += amount
+            if self.tail is not None:
+                self.__put_tail(values)
+        if self.online:
+            self.currents_ready.set()
+
+    def __put_tail(self, values):
+        """ Keep the last `drift_tail_size` currents in circular buffer """
+        # chunk longer than the tail: only its last samples are kept, they go where the stream puts them
+        position = (self.received + max(len(values) - len(self.tail), 0)) % len(self.tail)
+        self.received += len(values)
+        values = values[-len(self.tail):]
+        first = min(len(values), len(self.tail) - position)
+        self.tail[position:position + first] = values[:first]
+        self.tail[:len(values) - first] = values[first:]
+
+    def __tail_currents(self):
+        """ The last `drift_tail_size` currents in order
 
-    def put_current(self, incoming_df):
-        """  Append currents dataframes until search interval won't will be filled up
+        Returns:
+            tuple: currents, sample number of the first one
+        """
+        if self.received <= len(self.tail):
+            return self.tail[:self.received], 0
+        position = self.received % len(self.tail)
+        return np.concatenate((self.tail[position:], self.tail[:position])), self.received - len(self.tail)
+
+    @property
+    def sync_stage_size(self):
+        """ Amount of currents samples used for sync """
+        return self.search_interval * self.sample_rate
+
+    @property
+    def drift_tail_size(self):
+        """ Amount of currents samples kept in the end of test for clock drift, the last flash sequence
+        has to fit in even if search interval is shorter than the time from its start till box stop
+        """
+        return max(self.search_interval, DRIFT_TAIL_TIME) * self.sample_rate
+
+    def __correlation_worker(self):
+        """ Online correlation thread, wakes up on new currents and at least every SYNC_SETTLE_TIME seconds,
+        so that settled sync events are picked up w/o new currents too. Makes the last pass once stopped
         """
-        if len(self.volta_sync_stage_df) < (self.search_interval * self.sample_rate):
-            self.volta_sync_stage_df = self.volta_sync_stage_df.append(incoming_df)
+        while True:
+            self.currents_ready.wait(max(SYNC_SETTLE_TIME, 0.1))
+            self.currents_ready.clear()
+            stopped = self.worker_stopped
+            try:
+                self.__correlate_online()
+            except Exception:
+                logger.warning('Online sync failed', exc_info=True)
+                self.correlator = None
+            if stopped:
+                return
+
+    def __stop_worker(self):
+        if self.worker:
+            self.worker_stopped = True
+            self.currents_ready.set()
+            self.worker.join()
+            self.worker = None
+
+    def __correlate_online(self):
+        """ (Re)start correlation once sync events settled down, finish it once search interval is filled up
+
+        Sync stage is append-only, so currents up to `currents_len` are correlated w/o lock
+        """
+        sync = None
+        with self.lock:
+            restart = self.sync_changed and time.time() - self.sync_changed >= SYNC_SETTLE_TIME
+            if restart:
+                self.sync_changed = None
+                self.sync_points = {}
+                try:
+                    sync = self.__prepare_sync_events()
+                except ValueError:
+                    logger.debug('Online sync: sync events are not ready yet', exc_info=True)
+            currents_len = self.currents_len
+        if restart:
+            self.correlator = None
+            if sync is None:
+                return
+            try:
+                refsig = self.ref_signal(sync)
+            except ValueError:
+                logger.debug('Online sync: reference signal is not ready yet', exc_info=True)
+                return
+            if len(refsig) < 2 or len(refsig) > self.sync_stage_size:
+                return
+            logger.debug('Online sync: correlating w/ refsignal of %s samples', len(refsig))
+            self.online_sync = sync
+            self.correlator = StreamingCorrelator(refsig, self.sync_stage_size - len(refsig) + 1)
+            self.correlated = 0
+        if not self.correlator or self.sync_points:
+            return
+        self.correlator.put(self.currents[self.correlated:currents_len])
+        self.correlated = currents_len
+        if currents_len >= self.sync_stage_size:
+            self.correlator.finish()
+            try:
+                sync_points = self.__sync_points(
+                    np.argmax(self.correlator.cc), self.online_sync, self.correlator.cc
+                )
+            except ValueError:
+                logger.warning('Online sync failed', exc_info=True)
+                self.correlator = None
+                return
+            with self.lock:
+                # sync events changed while correlating, result is stale
+                if not self.sync_changed:
+                    self.sync_points = sync_points
+                    logger.info('Online sync points: %s', self.sync_points)
 
     def find_sync_points(self):
-        """ Cross correlation and calculate offsets
+        """ Cross correlation and calculate offsets, publish per-edge residuals as `sync_edge_residuals` metric
 
         Returns:
             dict: offsets for 'volta timestamp -> system log timestamp' and 'volta timestamp -> custom log timestamp'
+                and sync confidence:
+                    sync_pslr - peak-to-sidelobe ratio of cross-correlation
+                    sync_second_peak_distance - distance from the peak to the best sidelobe, us
+                    sync_edge_residuals - sync events vs currents steps found around them, us
         """
+        self.__stop_worker()
+        sync_points = self.__find_sync_points()
+        if self.drift and sync_points:
+            try:
+                sync_points = dict(sync_points, **self.__find_drift(sync_points))
+            except ValueError as exc:
+                logger.debug('Failed to estimate clock drift', exc_info=True)
+                logger.warning('Failed to estimate clock drift: %s', exc)
+        if sync_points.get('sync_pslr') is not None and sync_points['sync_pslr'] < SYNC_MIN_PSLR:
+            logger.warning(
+                'Sync is ambiguous: peak-to-sidelobe ratio %.2f, second best peak at %s us from the peak',
+                sync_points['sync_pslr'], sync_points['sync_second_peak_distance']
+            )
+        if self.edge_residuals is not None:
+            if 'sync_edge_residuals' not in self.my_metrics:
+                self.my_metrics['sync_edge_residuals'] = self.core.data_session.new_metric(
+                    {
+                        'type': 'metrics',
+                        'name': 'sync_edge_residuals',
+                        'source': 'sync'
+                    }
+                )
+            self.my_metrics['sync_edge_residuals'].put(self.edge_residuals)
+        return sync_points
+
+    def __find_sync_points(self):
         try:
+            with self.lock:
+                if self.sync_points and not self.sync_changed:
+                    logger.info('Using sync points calculated online')
+                    return self.sync_points
             logger.info('Starting sync...')
 
-            if len(self.sync_df) == 0:
+            if len(self.sync_events['message']) == 0:
                 raise ValueError('No sync events found!')
 
-            logger.debug('Sync df contents:\n %s', self.sync_df.describe())
-            self.__prepare_sync_df()
-            logger.debug('Sync df after preparation:\n %s', self.sync_df.describe())
-            logger.debug('Sync stage volta currents dataframe:\n %s', self.volta_sync_stage_df.describe())
+            sync = self.__prepare_sync_events()
+            logger.debug('Sync events after preparation:\n %s', sync)
 
-            if len(self.volta_sync_stage_df) < (self.search_interval * self.sample_rate):
+            if self.currents is None or self.currents_len < self.sync_stage_size:
                 raise ValueError('Not enough electrical currents for sync')
 
-            refsig = self.ref_signal(self.sync_df)
-            logger.debug('Refsignal len: %s, Refsignal contents:\n %s', len(refsig), refsig)
-
-            cc = self.cross_correlate(
-                self.volta_sync_stage_df['value'],
-                refsig,
-                (self.search_interval * self.sample_rate)
-            )
-            logger.debug('Cross correlation: %s', cc)
-
-            # [sample_offset] volta sample <-> first sync event
-            first_sync_offset_sample = np.argmax(cc)
-            logger.debug('[sample_offset] volta sample <-> first sync event: %s', first_sync_offset_sample)
-
-            # [uts_offset] volta uts <-> first sync event
-            sync_offset = self.volta_sync_stage_df.iloc[first_sync_offset_sample]['ts']
-            logger.debug('[uts_offset] volta uts <-> first sync event: %s', sync_offset)
-
-            return {
-                # [uts_offset] volta uts <-> phone system uts
-                'sys_uts_offset':  int(
-                    sync_offset - self.sync_df[self.sync_df.message > 0].iloc[0]['sys_uts']
-                ),
-                # [uts_offset] volta uts <-> phone log uts
-                'log_uts_offset': int(
-                    sync_offset - self.sync_df[self.sync_df.message > 0].iloc[0]["log_uts"]
-                ),
-                'sync_sample': first_sync_offset_sample
-            }
+            return self.__sync_points(*self.__search(self.currents, sync))
         except ValueError:
             logger.debug('Failed to calculate sync pts', exc_info=True)
             logger.warning('Failed to calculate sync pts')
             return {}
 
-    def __prepare_sync_df(self):
-        """ Reset idx, drop excessive sync data, map sync events and make offset """
-        # map messages
-        self.sync_df.loc[:, ('message')] = self.sync_df.message.map({'rise': 1, 'fall': 0})
-        self.sync_df.reset_index(inplace=True)
+    def __search(self, currents, sync):
+        """ Find the first sync event sample in currents
 
-        # drop sync events after search interval - we don't need this
-        self.sync_df = self.sync_df[self.sync_df.sys_uts < self.sync_df.sys_uts[0] + (self.search_interval * 10 ** 6)]
+        Returns:
+            tuple: first sync event sample, sync, cross-correlation and its lag in samples
+        """
+        if self.decimation > 1:
+            sample, coarse_cc = self.__coarse_to_fine(currents, sync)
+            return sample, sync, coarse_cc, self.decimation
 
-        # offset
-        self.sync_df.loc[:, ('sample_offset')] = self.sync_df['sys_uts'].map(
-            lambda x: (
-                (x - self.sync_df['sys_uts'][0])
-            ) * self.sample_rate // 10**6
+        refsig = self.ref_signal(sync)
+        logger.debug('Refsignal len: %s, Refsignal contents:\n %s', len(refsig), refsig)
+        if len(refsig) > len(currents):
+            raise ValueError('Sync events are out of search interval')
+
+        cc = self.cross_correlate(
+            currents,
+            refsig,
+            len(currents)
+        )
+        logger.debug('Cross correlation: %s', cc)
+        return np.argmax(cc), sync, cc, 1
+
+    def __find_drift(self, sync_points):
+        """ Clock skew by the last flash sequence, at least search interval after the first one
+
+        Returns:
+            dict: skews of phone system and log clocks, anchor uts of the first sync rise and the last sequence sample
+        """
+        sys_uts = np.array(self.sync_events['sys_uts'], dtype=np.int64)
+        interval = self.search_interval * 10 ** 6
+        last_sequence = np.flatnonzero(sys_uts >= max(sys_uts[0] + interval, sys_uts[-1] - interval))
+        if not len(last_sequence) or self.tail is None:
+            raise ValueError('No sync events in the end of test')
+        start_sync = self.__prepare_sync_events()
+        end_sync = self.__prepare_sync_events(last_sequence[0])
+        currents, first_sample = self.__tail_currents()
+        # start of the last sequence by constant offset, clock drift shifts it way less than the tail length
+        expected_sample = (
+            (end_sync['sys_uts'][0] + sync_points['sys_uts_offset']) * self.sample_rate // 10 ** 6 - self.currents_start
+        )
+        if expected_sample < first_sample:
+            raise ValueError(
+                'The last flash sequence starts %.1f s before kept currents, it ran longer than %s s before box stop'
+                % (float(first_sample - expected_sample) / self.sample_rate, len(self.tail) // self.sample_rate)
+            )
+        end_sample = int(self.__search(currents, end_sync)[0]) + first_sample
+        end_ts = self.__sample_ts(end_sample)
+
+        start_rise = np.flatnonzero(start_sync['message'] > 0)[0]
+        end_rise = np.flatnonzero(end_sync['message'] > 0)
+        if not len(end_rise):
+            raise ValueError('No rise sync events in the end of test')
+        drift = {
+            'sync_end_sample': end_sample,
+        }
+        for clock in ['sys_uts', 'log_uts']:
+            start_uts, end_uts = start_sync[clock][start_rise], end_sync[clock][end_rise[0]]
+            drift['sync_%s' % clock] = int(start_uts)
+            drift['%s_skew' % clock] = float(
+                ((end_ts - end_uts) - sync_points['%s_offset' % clock]) / float(end_uts - start_uts)
+            )
+        logger.info('Clock drift: %s', drift)
+        return drift
+
+    def __coarse_to_fine(self, currents, sync):
+        """ Multi-resolution search of the first sync event sample
+
+        Correlates currents averaged over `decimation` samples w/ decimated reference signal,
+        then refines the peak at full rate in +-2 * decimation samples around it
+
+        Returns:
+            tuple: first sync event sample, coarse cross-correlation
+        """
+        ref_len = sync['sample_offset'][-1]
+        if ref_len < 1 or ref_len > len(currents):
+            raise ValueError('Sync events are out of search interval')
+        size = len(currents) // self.decimation
+        coarse_currents = currents[:size * self.decimation].reshape(size, self.decimation).mean(axis=1)
+        coarse_sync = dict(sync, sample_offset=sync['sample_offset'] // self.decimation)
+        coarse_cc = self.cross_correlate(coarse_currents, self.ref_signal(coarse_sync), size)
+        coarse_sample = int(np.argmax(coarse_cc)) * self.decimation
+        logger.debug('Coarse first sync event sample: %s', coarse_sample)
+
+        lags = np.arange(
+            max(coarse_sample - 2 * self.decimation, 0),
+            min(coarse_sample + 2 * self.decimation, len(currents) - ref_len) + 1
+        )
+        cc = self.edge_correlate(currents, sync, lags)
+        return lags[np.argmax(cc)], coarse_cc
+
+    def __sync_points(self, first_sync_offset_sample, sync, cc, cc_step=1):
+        """ Offsets and confidence from cross-correlation peak
+
+        Args:
+            first_sync_offset_sample (int): sync stage sample of the first sync event
+            sync (dict): prepared sync events
+            cc (numpy.array): cross-correlation, lag `n` is sample `n * cc_step`
+        """
+        # [sample_offset] volta sample <-> first sync event
+        logger.debug('[sample_offset] volta sample <-> first sync event: %s', first_sync_offset_sample)
+
+        # [uts_offset] volta uts <-> first sync event
+        sync_offset = self.__sample_ts(first_sync_offset_sample)
+        logger.debug('[uts_offset] volta uts <-> first sync event: %s', sync_offset)
+
+        first_rise = np.flatnonzero(sync['message'] > 0)
+        if not len(first_rise):
+            raise ValueError('No rise sync events found!')
+
+        # main lobe of square signals autocorrelation is as wide as the shortest flash or pause
+        shortest = max(int(np.diff(sync['sample_offset']).min()), 1)
+        pslr, second_peak = self.peak_diagnostics(cc, max(shortest // cc_step, 1))
+        edges, residuals = self.__edge_residuals(first_sync_offset_sample, sync, shortest // 2)
+        self.edge_residuals = pd.DataFrame({
+            'ts': [self.__sample_ts(edge) for edge in edges],
+            'value': residuals,
+        }, columns=['ts', 'value'])
+        return {
+            # [uts_offset] volta uts <-> phone system uts
+            'sys_uts_offset':  int(sync_offset - sync['sys_uts'][first_rise[0]]),
+            # [uts_offset] volta uts <-> phone log uts
+            'log_uts_offset': int(sync_offset - sync['log_uts'][first_rise[0]]),
+            'sync_sample': int(first_sync_offset_sample),
+            'sync_pslr': pslr,
+            'sync_second_peak_distance': None if second_peak is None else int(
+                (second_peak * cc_step - first_sync_offset_sample) * 10 ** 6 // self.sample_rate
+            ),
+            'sync_edge_residuals': residuals,
+        }
+
+    @staticmethod
+    def peak_diagnostics(cc, exclusion):
+        """ Peak-to-sidelobe ratio and the best sidelobe lag of cross-correlation
+
+        Sidelobes are lags at least `exclusion` lags away from the peak.
+
+        Returns:
+            tuple: ratio of the peak to the best sidelobe (None if sidelobe is not positive), sidelobe lag
+        """
+        peak = int(np.argmax(cc))
+        left, right = cc[:max(peak - exclusion + 1, 0)], cc[peak + exclusion:]
+        candidates = [(lobe[np.argmax(lobe)], start + int(np.argmax(lobe)))
+                      for lobe, start in [(left, 0), (right, peak + exclusion)] if len(lobe)]
+        if not candidates:
+            return None, None
+        sidelobe, second_peak = max(candidates)
+        if sidelobe <= 0:
+            return None, second_peak
+        return float(cc[peak] / sidelobe), second_peak
+
+    def __edge_residuals(self, sample, sync, half_width):
+        """ Find steps in currents in +-half_width samples around every sync event
+
+        Step at sample t is the difference of currents means over half_width samples after and before t,
+        rises are searched for the biggest step up, falls - for the biggest step down.
+
+        Returns:
+            tuple: list of expected sync stage samples of sync events, list of residuals, us
+        """
+        half_width = max(half_width, 1)
+        edges, residuals = [], []
+        candidates = np.arange(half_width, 3 * half_width + 1)
+        for offset, message in zip(sync['sample_offset'], sync['message']):
+            expected = sample + offset
+            start = expected - 2 * half_width
+            if start < 0 or expected + 2 * half_width > self.currents_len:
+                continue
+            prefix = np.concatenate(
+                ([0], np.cumsum(self.currents[start:expected + 2 * half_width], dtype=np.float64))
+            )
+            steps = (prefix[candidates + half_width] - prefix[candidates]) - \
+                (prefix[candidates] - prefix[candidates - half_width])
+            found = candidates[np.argmax(steps if message > 0 else -steps)]
+            edges.append(int(expected))
+            residuals.append(int((found - 2 * half_width) * 10 ** 6 // self.sample_rate))
+        return edges, residuals
+
+    def __sample_ts(self, sample):
+        """ Timestamp of sync stage sample, the same TimeChopper gives it """
+        return sample_timestamps(self.currents_start + sample, 1, self.sample_rate)[0]
+
+    def __prepare_sync_events(self, first=0):
+        """ Columns of sync events from `first` one: drop excessive sync data, map sync events and make offset
+
+        Returns:
+            dict: numpy arrays of 'sys_uts', 'log_uts', 'message' and 'sample_offset'
+        """
+        sys_uts = np.array(self.sync_events['sys_uts'][first:], dtype=np.int64)
+        # map messages, unknown ones are dropped
+        message = np.array(
+            [{'rise': 1, 'fall': 0}.get(msg, -1) for msg in self.sync_events['message'][first:]], dtype=np.int8
         )
+        # drop sync events after search interval - we don't need this
+        keep = (sys_uts < sys_uts[0] + (self.search_interval * 10 ** 6)) & (message >= 0)
+        if not keep.any():
+            raise ValueError('No rise/fall sync events found!')
+        sync = {
+            'sys_uts': sys_uts[keep],
+            'log_uts': np.array(self.sync_events['log_uts'][first:], dtype=np.int64)[keep],
+            'message': message[keep],
+        }
+        # offset
+        sync['sample_offset'] = (sync['sys_uts'] - sync['sys_uts'][0]) * self.sample_rate // 10 ** 6
+        return sync
 
     @staticmethod
     def ref_signal(sync):
-        """ Generate square reference signal """
+        """ Generate square reference signal
+
+        Each sync event level is repeated up to the next event's sample offset, w/o interpolation.
+
+        Returns:
+            numpy.array: float32 reference signal w/ zero mean, sample_offset[-1] samples
+        """
         logger.info("Generating ref signal...")
-        if len(sync) == 0:
-            raise ValueError('Sync events not found.')
-        f = interpolate.interp1d(sync["sample_offset"], sync["message"], kind="zero")
-        X = np.linspace(0, sync["sample_offset"].values[-1], sync["sample_offset"].values[-1])
-        rs = f(X)
-        return rs - np.mean(rs)
+        offsets = np.asarray(sync["sample_offset"])
+        if len(offsets) < 2 or offsets[-1] < 1:
+            raise ValueError('Not enough sync events found.')
+        rs = np.repeat(np.asarray(sync["message"], dtype=np.int8)[:-1], np.diff(offsets))
+        return np.subtract(rs, np.mean(rs), dtype=np.float32)
 
     @staticmethod
     def cross_correlate(sig, ref, first=30000):
@@ -147,8 +511,89 @@ class SyncFinder(DataListener):
         logger.info("Calculating cross-correlation...")
         return signal.fftconvolve(sig[:first], ref[::-1], mode="valid")
 
+    @staticmethod
+    def edge_correlate(sig, sync, lags):
+        """ Calculate cross-correlation w/ square reference signal of sync events for given lags only
+
+        Reference signal is constant between sync events, so each lag is a weighted sum of
+        box sums over prefix sum of the signal - O(sync events) per lag w/o reference signal itself
+        """
+        offsets = np.asarray(sync['sample_offset'])
+        levels = np.asarray(sync['message'], dtype=float)
+        ref_len = offsets[-1]
+        levels = levels[:-1] - np.dot(levels[:-1], np.diff(offsets)) / ref_len
+        first = lags[0]
+        prefix = np.concatenate(([0], np.cumsum(sig[first:lags[-1] + ref_len], dtype=np.float64)))
+        lags = lags - first
+        cc = np.zeros(len(lags))
+        for level, start, end in zip(levels, offsets[:-1], offsets[1:]):
+            cc += level * (prefix[lags + end] - prefix[lags + start])
+        return cc
+
     def close(self):
-        return
+        self.__stop_worker()
 
     def get_info(self):
         return
+
+
+def align_ts(uts, sync_points, clock='sys_uts'):
+    """ Phone uts -> volta uts w/ sync offset and clock skew, if drift was estimated
+
+    Stored phone events keep phone timestamps, consumers of uploaded job/metric meta map them this way
+
+    Args:
+        uts (int or numpy.array): phone system ('sys_uts' clock) or log ('log_uts' clock) timestamps
+        sync_points (dict): SyncFinder.find_sync_points result
+    """
+    skew = sync_points.get('%s_skew' % clock, 0)
+    anchor = sync_points.get('sync_%s' % clock, 0)
+    return uts + sync_points['%s_offset' % clock] + np.round((uts - anchor) * skew).astype(np.int64)
+
+
+class StreamingCorrelator(object):
+    """ Cross-correlation of samples stream w/ reference signal, calculated by overlap-save blocks
+    while samples arrive. Gives the same lags as `SyncFinder.cross_correlate` over the whole stream.
+
+    Attributes:
+        lags (int): amount of lags to calculate, `len(sig) - len(ref) + 1` for the whole stream `sig`
+        cc (numpy.array): cross-correlation, lags are valid up to `computed`
+        received (int): amount of samples received
+    """
+
+    def __init__(self, ref, lags):
+        self.ref_len = len(ref)
+        self.lags = lags
+        self.nfft = 2 ** int(np.ceil(np.log2(2 * self.ref_len)))
+        self.step = self.nfft - self.ref_len + 1
+        self.ref_fft = np.conj(np.fft.rfft(ref, self.nfft))
+        self.cc = np.zeros(lags)
+        self.computed = 0
+        self.received = 0
+        self.pending = []
+        self.pending_len = 0
+
+    def put(self, values):
+        """ Put next samples, calculate all the blocks that became complete """
+        if not len(values):
+            return
+        self.pending.append(values)
+        self.pending_len += len(values)
+        self.received += len(values)
+        while self.computed < self.lags and self.pending_len >= self.nfft:
+            self.__block()
+
+    def finish(self):
+        """ End of stream - calculate lags left from the last incomplete block """
+        while self.computed < self.lags and self.pending_len >= self.ref_len:
+            self.__block()
+
+    def __block(self):
+        data = np.concatenate(self.pending)
+        segment = data[:self.nfft]
+        amount = min(self.step, self.lags - self.computed, len(segment) - self.ref_len + 1)
+        cc = np.fft.irfft(np.fft.rfft(segment, self.nfft) * self.ref_fft, self.nfft)
+        self.cc[self.computed:self.computed + amount] = cc[:amount]
+        self.computed += amount
+        self.pending = [data[self.step:]]
+        self.pending_len = len(self.pending[0])
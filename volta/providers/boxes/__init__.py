@@ -1,3 +1,4 @@
 from .box500hz import VoltaBox500Hz
 from .box_binary import VoltaBoxBinary, VoltaBoxStm32
 from .box_yattor import YattorBox
+from .box_replay import VoltaBoxReplay
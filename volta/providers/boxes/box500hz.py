@@ -3,9 +3,10 @@
 import logging
 import queue as q
 import time
+import numpy as np
 
 from volta.common.interfaces import VoltaBox
-from volta.common.util import TimeChopper
+from volta.common.util import TimeChopper, CurrentRouter, string_to_np
 
 from netort.data_processing import Drain
 
@@ -25,9 +26,16 @@ class VoltaBox500Hz(VoltaBox):
         self.data_source = self.source_opener()
         logger.debug('Data source initialized: %s', self.data_source)
         self.my_metrics = {}
+        self.__create_my_metrics()
 
     def __create_my_metrics(self):
-        self.my_metrics['currents'] = self.core.data_session.new_metric()
+        self.my_metrics['current'] = self.core.data_session.new_metric(
+            {
+                'type': 'metrics',
+                'name': 'current',
+                'source': 'voltabox'
+            }
+        )
 
     def start_test(self, results):
         """ Grab stage - starts grabber thread and puts data to results queue
@@ -48,14 +56,14 @@ class VoltaBox500Hz(VoltaBox):
 
         logger.info('reader init?')
         self.reader = BoxPlainTextReader(
-            self.data_source, self.sample_rate
+            self.data_source, self.sample_rate, recorder=self.create_recorder(np.float32)
         )
         logger.info('reader init!')
         self.pipeline = Drain(
             TimeChopper(
-                self.reader, self.sample_rate, self.chop_ratio
+                self.acquire(self.reader), self.sample_rate, self.chop_ratio
             ),
-            self.my_metrics['currents']
+            CurrentRouter(self.my_metrics['current'], self.current_listeners)
         )
         logger.info('Starting grab thread...')
         self.pipeline.start()
@@ -63,8 +71,12 @@ class VoltaBox500Hz(VoltaBox):
 
     def end_test(self):
         self.reader.close()
+        if self.acquisition:
+            self.acquisition.close()
         self.pipeline.close()
         self.pipeline.join(10)
+        if self.recorder:
+            self.recorder.close()
         self.data_source.close()
 
     def get_info(self):
@@ -73,36 +85,60 @@ class VoltaBox500Hz(VoltaBox):
             data['grabber_alive'] = self.pipeline.isAlive()
         if self.grabber_q:
             data['grabber_queue_size'] = self.grabber_q.qsize()
+        if self.acquisition:
+            data.update(self.acquisition.get_info())
         return data
 
 
 class BoxPlainTextReader(object):
     """
     Read chunks from source, convert and return numpy.array
+
+    Source data are newline-separated samples, parsed in bulk w/ numpy.
+    Partial line at the end of a read is kept until the next read.
+
+    Attributes:
+        recorder (RawCaptureWriter): raw capture recorder, gets parsed float32 samples
     """
 
-    def __init__(self, source, cache_size=1024 * 1024 * 10):
+    def __init__(self, source, cache_size=1024 * 1024 * 10, recorder=None):
         self.closed = False
+        self.recorder = recorder
         self.cache_size = cache_size
         self.source = source
-        self.buffer = ""
+        self.buffer = b""
 
     def _read_chunk(self):
         data = self.source.read(self.cache_size)
-        logger.info('Data:%s', data)
         if data:
-            parts = data.rsplit('\n', 1)
+            parts = data.rsplit(b'\n', 1)
             if len(parts) > 1:
-                ready_chunk = self.buffer + parts[0] + '\n'
+                ready_chunk = self.buffer + parts[0]
                 self.buffer = parts[1]
-                # FIXME string_to_np(ready_chunk, type=float, sep='\n')
-                #return string_to_np(ready_chunk, type=float, sep='\n')
+                chunk = self.__parse(ready_chunk)
+                if self.recorder:
+                    self.recorder.write(chunk)
+                return chunk
             else:
                 self.buffer += parts[0]
         else:
-            self.buffer += self.source.readline()
+            time.sleep(1)
         return None
 
+    @staticmethod
+    def __parse(data):
+        try:
+            return string_to_np(data, type=np.float32, sep='\n')
+        except ValueError:
+            logger.debug('Trash data in plain text chunk, dropping malformed lines', exc_info=True)
+            values = []
+            for line in data.split():
+                try:
+                    values.append(float(line))
+                except ValueError:
+                    continue
+            return np.array(values, dtype=np.float32)
+
     def __iter__(self):
         while not self.closed:
             yield self._read_chunk()
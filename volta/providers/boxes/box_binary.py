@@ -1,13 +1,13 @@
 """ Binary Volta box
 """
 import logging
-import Queue as queue
+import queue
 import time
 import numpy as np
 import json
 
 from volta.common.interfaces import VoltaBox
-from volta.common.util import TimeChopper, string_to_np
+from volta.common.util import TimeChopper, CurrentRouter, string_to_np
 
 from netort.data_processing import Drain
 
@@ -21,6 +21,7 @@ class VoltaBoxBinary(VoltaBox):
         VoltaBox.__init__(self, config, core)
         self.sample_rate = config.get_option('volta', 'sample_rate', 10000)
         self.baud_rate = config.get_option('volta', 'baud_rate', 230400)
+        self.zero_copy = config.get_option('volta', 'zero_copy', False)
         self.source_opener.baud_rate = self.baud_rate
         self.source_opener.read_timeout = self.grab_timeout
         self.data_source = self.source_opener()
@@ -71,13 +72,15 @@ class VoltaBoxBinary(VoltaBox):
             self.offset,
             self.power_voltage,
             self.precision,
-            sample_swap=self.sample_swap
+            sample_swap=self.sample_swap,
+            zero_copy=self.zero_copy,
+            recorder=self.create_recorder(np.uint16)
         )
         self.pipeline = Drain(
             TimeChopper(
-                self.reader, self.sample_rate, self.chop_ratio
+                self.acquire(self.reader, self.reader.chunk_size // 2 + 1), self.sample_rate, self.chop_ratio
             ),
-            self.my_metrics['current']
+            CurrentRouter(self.my_metrics['current'], self.current_listeners)
         )
         logger.info('Starting grab thread...')
         self.pipeline.start()
@@ -89,12 +92,16 @@ class VoltaBoxBinary(VoltaBox):
         except AttributeError:
             logger.warning('VoltaBox has no Reader. Seems like VoltaBox initialization failed')
             logger.debug('VoltaBox has no Reader. Seems like VoltaBox initialization failed', exc_info=True)
+        if self.acquisition:
+            self.acquisition.close()
         try:
             self.pipeline.close()
         except AttributeError:
             logger.warning('VoltaBox has no Pipeline. Seems like VoltaBox initialization failed')
         else:
             self.pipeline.join(10)
+        if self.recorder:
+            self.recorder.close()
         self.data_source.close()
 
     def get_info(self):
@@ -103,6 +110,8 @@ class VoltaBoxBinary(VoltaBox):
             data['grabber_alive'] = self.pipeline.isAlive()
         if self.grabber_q:
             data['grabber_queue_size'] = self.grabber_q.qsize()
+        if self.acquisition:
+            data.update(self.acquisition.get_info())
         return data
 
 
@@ -131,25 +140,61 @@ class VoltaBoxStm32(VoltaBoxBinary):
             self.slope,
             self.offset,
             self.power_voltage,
-            self.precision
+            self.precision,
+            zero_copy=self.zero_copy,
+            recorder=self.create_recorder(np.uint16)
         )
         self.pipeline = Drain(
             TimeChopper(
-                self.reader, self.sample_rate, self.chop_ratio
+                self.acquire(self.reader, self.reader.chunk_size // 2 + 1), self.sample_rate, self.chop_ratio
             ),
-            self.my_metrics['current']
+            CurrentRouter(self.my_metrics['current'], self.current_listeners)
         )
         logger.info('Starting grab thread...')
         self.pipeline.start()
         logger.debug('Waiting grabber thread finish...')
 
 
+def swap_samples(words, swap=False):
+    """ Detect byte-swapped samples and swap them back, in place
+
+    Sample is swapped if its little-endian word > 0x0FFF
+    or previous sample was swapped and (word & 0x00F0) == 0
+
+    Args:
+        words (numpy.array): uint16 samples
+        swap (bool): whether sample before the first one was swapped
+    Returns:
+        bool: whether the last sample was swapped
+    """
+    if not len(words):
+        return swap
+    words = words.view('<u2')
+    idx = np.arange(len(words))
+    # swapped state starts at every word > 0x0FFF and lasts while (word & 0x00F0) == 0
+    last_start = np.maximum.accumulate(np.where(words > 0x0FFF, idx, -2))
+    last_break = np.maximum.accumulate(np.where(words & 0x00F0, idx, -2))
+    if swap:
+        np.maximum(last_start, -1, out=last_start)
+    swapped = (last_start >= last_break) & (last_start > -2)
+    words[swapped] = words[swapped].byteswap()
+    return bool(swapped[-1])
+
+
 class BoxBinaryReader(object):
     """
     Read chunks from source, convert and return numpy.array
+
+    Attributes:
+        zero_copy (bool): read into preallocated buffers w/ readinto() and calibrate samples in place.
+            Returned array is reused by the next read, so consumer should copy data it wants to keep
+        recorder (RawCaptureWriter): raw capture recorder, gets uint16 samples before calibration
     """
 
-    def __init__(self, source, sample_rate, slope=1, offset=0, power_voltage=4700, precision=10, sample_swap=False):
+    def __init__(
+            self, source, sample_rate, slope=1, offset=0, power_voltage=4700, precision=10, sample_swap=False,
+            zero_copy=False, recorder=None
+    ):
         self.closed = False
         self.source = source
         self.sample_rate = sample_rate
@@ -161,25 +206,20 @@ class BoxBinaryReader(object):
         self.power_voltage = float(power_voltage)
         self.swap = False
         self.sample_swap = sample_swap
+        self.zero_copy = zero_copy
+        self.recorder = recorder
+        self.chunk_size = self.sample_rate * 2 * 10
+        if self.zero_copy:
+            # one extra byte in front of the buffer for orphan byte of the previous read
+            self.read_buffer = bytearray(self.chunk_size + 1)
+            self.read_view = memoryview(self.read_buffer)
+            self.output = np.empty(self.chunk_size // 2 + 1, dtype=np.float32)
+            self.has_orphan_byte = False
 
-    def __sample_swap(self, data):
-        lst = list(data)
-        for i in range(len(lst)/2):
-            lo = ord(lst[i*2])
-            hi = ord(lst[i*2+1])
-            word = (hi << 8) + lo
-            if word>0x0FFF or (self.swap and (word&0x00F0)==0):
-                self.swap = True
-                tmp = lst[i*2]
-                lst[i*2] = lst[i*2+1]
-                lst[i*2+1] = tmp
-            else:
-                self.swap = False
-        data = ''.join(lst)
-        return data
-    
     def _read_chunk(self):
-        data = self.source.read(self.sample_rate * 2 * 10)
+        if self.zero_copy:
+            return self._read_chunk_into()
+        data = self.source.read(self.chunk_size)
         if data:
             if self.orphan_byte:
                 data = self.orphan_byte + data
@@ -187,14 +227,41 @@ class BoxBinaryReader(object):
             if len(data) % 2 != 0:
                 self.orphan_byte = data[-1:]
                 data = data[:-1]
+            words = string_to_np(data)
             if self.sample_swap:
-                data = self.__sample_swap(data)
-            chunk = string_to_np(data).astype(np.float32) * (
+                words = words.copy()
+                self.swap = swap_samples(words, self.swap)
+            if self.recorder:
+                self.recorder.write(words)
+            chunk = words.astype(np.float32) * (
                 self.power_voltage / (2 ** self.precision)) * self.slope + self.offset
             return chunk
         else:
             time.sleep(1)
 
+    def _read_chunk_into(self):
+        """ Read to reusable buffer, view it as uint16 and calibrate into preallocated float32 output """
+        start = 1 if self.has_orphan_byte else 0
+        amount = self.source.readinto(self.read_view[start:])
+        if not amount:
+            time.sleep(1)
+            return
+        length = start + amount
+        self.has_orphan_byte = length % 2 != 0
+        if self.has_orphan_byte:
+            length -= 1
+        words = np.frombuffer(self.read_buffer, dtype=np.uint16, count=length // 2)
+        if self.sample_swap:
+            self.swap = swap_samples(words, self.swap)
+        if self.recorder:
+            self.recorder.write(words)
+        chunk = self.output[:length // 2]
+        np.multiply(words, np.float32(self.power_voltage / (2 ** self.precision) * self.slope), out=chunk)
+        chunk += np.float32(self.offset)
+        if self.has_orphan_byte:
+            self.read_buffer[0] = self.read_buffer[length]
+        return chunk
+
     def __iter__(self):
         while not self.closed:
             yield self._read_chunk()
@@ -0,0 +1,156 @@
+""" Replay Volta box - streams recorded capture instead of device
+"""
+import logging
+import time
+import numpy as np
+
+from volta.common.interfaces import VoltaBox
+from volta.common.util import TimeChopper, CurrentRouter, load_raw_capture
+
+from netort.data_processing import Drain
+
+logger = logging.getLogger(__name__)
+
+
+class VoltaBoxReplay(VoltaBox):
+    """ VoltaBoxReplay - streams previously recorded capture through the usual currents pipeline
+
+    Source may be raw capture recorded w/ `raw_capture` option (sample rate and calibration are taken
+    from its header) or plain binary capture of uint16 samples (sample rate and calibration from config)
+
+    Attributes:
+        replay_speed (float): 1 means real time, N means N times faster, 0 means as fast as possible
+    """
+
+    def __init__(self, config, core):
+        VoltaBox.__init__(self, config, core)
+        self.replay_speed = config.get_option('volta', 'replay_speed', 1.0)
+        self.fname = self.source_opener.get_filename
+        try:
+            meta, self.samples = load_raw_capture(self.fname)
+        except ValueError:
+            logger.info('%s has no raw capture header, replaying as binary capture', self.fname)
+            meta = {}
+            self.samples = np.memmap(self.fname, dtype=np.uint16, mode='r')
+        self.sample_rate = meta.get('sample_rate') or config.get_option('volta', 'sample_rate', 10000)
+        self.precision = meta.get('precision', self.precision)
+        self.slope = meta.get('slope', self.slope)
+        self.offset = meta.get('offset', self.offset)
+        self.power_voltage = meta.get('power_voltage', self.power_voltage)
+        logger.info(
+            'Replaying %s samples from %s, sample rate %s, speed %s',
+            len(self.samples), self.fname, self.sample_rate, self.replay_speed
+        )
+        self.my_metrics = {}
+        self.__create_my_metrics()
+
+    def __create_my_metrics(self):
+        self.my_metrics['current'] = self.core.data_session.new_metric(
+            {
+                'type': 'metrics',
+                'name': 'current',
+                'source': 'voltabox'
+            }
+        )
+
+    def start_test(self, results):
+        """ Grab stage - starts grabber thread and puts data to results queue
+
+            pipeline
+                read recorded capture w/ replay speed ->
+                chop by samplerate w/ ratio ->
+                drain chunks to listeners and data_session
+
+        Args:
+            results: object answers to put() and get() methods
+        """
+        self.grabber_q = results
+        self.reader = ReplayReader(
+            self.samples,
+            self.sample_rate,
+            self.replay_speed,
+            self.slope,
+            self.offset,
+            self.power_voltage,
+            self.precision
+        )
+        self.pipeline = Drain(
+            TimeChopper(
+                self.acquire(self.reader, self.reader.chunk_size), self.sample_rate, self.chop_ratio
+            ),
+            CurrentRouter(self.my_metrics['current'], self.current_listeners)
+        )
+        logger.info('Starting grab thread...')
+        self.pipeline.start()
+
+    def end_test(self):
+        try:
+            self.reader.close()
+        except AttributeError:
+            logger.warning('VoltaBox has no Reader. Seems like VoltaBox initialization failed')
+        if self.acquisition:
+            self.acquisition.close()
+        try:
+            self.pipeline.close()
+        except AttributeError:
+            logger.warning('VoltaBox has no Pipeline. Seems like VoltaBox initialization failed')
+        else:
+            self.pipeline.join(10)
+
+    def get_info(self):
+        data = {}
+        if self.pipeline:
+            data['grabber_alive'] = self.pipeline.isAlive()
+        if self.grabber_q:
+            data['grabber_queue_size'] = self.grabber_q.qsize()
+        if self.reader:
+            data['replay_position'] = self.reader.position
+        if self.acquisition:
+            data.update(self.acquisition.get_info())
+        return data
+
+
+class ReplayReader(object):
+    """
+    Read chunks from recorded samples w/ replay speed, calibrate uint16 samples, return numpy.array
+
+    Attributes:
+        speed (float): 1 means real time, N means N times faster, 0 means as fast as possible
+        chunk_size (int): samples per chunk, 100ms of data
+    """
+
+    def __init__(self, samples, sample_rate, speed=1.0, slope=1, offset=0, power_voltage=4700, precision=10):
+        self.closed = False
+        self.samples = samples
+        self.sample_rate = sample_rate
+        self.speed = speed
+        self.slope = slope
+        self.offset = offset
+        self.precision = precision
+        self.power_voltage = float(power_voltage)
+        self.chunk_size = max(self.sample_rate // 10, 1)
+        self.position = 0
+        self.start = None
+
+    def _read_chunk(self):
+        if self.start is None:
+            self.start = time.time()
+        end = min(self.position + self.chunk_size, len(self.samples))
+        if self.speed:
+            delay = self.start + float(end) / self.sample_rate / self.speed - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        data = self.samples[self.position:end]
+        self.position = end
+        if data.dtype == np.uint16:
+            return data.astype(np.float32) * (
+                self.power_voltage / (2 ** self.precision)) * self.slope + self.offset
+        return np.array(data, dtype=np.float32)
+
+    def __iter__(self):
+        while not self.closed and self.position < len(self.samples):
+            yield self._read_chunk()
+        logger.info('Replay finished, %s samples replayed', self.position)
+
+    def close(self):
+        self.closed = True
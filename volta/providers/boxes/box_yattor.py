@@ -1,11 +1,11 @@
 import logging
-import Queue as queue
+import queue
 import time
 import numpy as np
 import json
 
 from volta.common.interfaces import VoltaBox
-from volta.common.util import TimeChopper, string_to_np
+from volta.common.util import TimeChopper, CurrentRouter, string_to_np
 
 from netort.data_processing import Drain
 
@@ -52,12 +52,12 @@ class YattorBox(VoltaBox):
         if self.lib.yattor_start(0)!=0:
             RuntimeError("Unable to start yattor")
 
-        self.reader = YattorReader(self.lib, self.sample_rate)
+        self.reader = YattorReader(self.lib, self.sample_rate, recorder=self.create_recorder(np.float32))
         self.pipeline = Drain(
             TimeChopper(
-                self.reader, self.sample_rate, self.chop_ratio
+                self.acquire(self.reader, self.sample_rate * 2), self.sample_rate, self.chop_ratio
             ),
-            self.my_metrics['current']
+            CurrentRouter(self.my_metrics['current'], self.current_listeners)
         )
         logger.info('Starting grab thread...')
         self.pipeline.start()
@@ -71,12 +71,16 @@ class YattorBox(VoltaBox):
         except AttributeError:
             logger.warn('VoltaBox has no Reader. Seems like VoltaBox initialization failed')
             logger.debug('VoltaBox has no Reader. Seems like VoltaBox initialization failed', exc_info=True)
+        if self.acquisition:
+            self.acquisition.close()
         try:
             self.pipeline.close()
         except AttributeError:
             logger.warn('VoltaBox has no Pipeline. Seems like VoltaBox initialization failed')
         else:
             self.pipeline.join(10)
+        if self.recorder:
+            self.recorder.close()
         self.lib.yattor_close()
 
 
@@ -86,13 +90,16 @@ class YattorBox(VoltaBox):
             data['grabber_alive'] = self.pipeline.isAlive()
         if self.grabber_q:
             data['grabber_queue_size'] = self.grabber_q.qsize()
+        if self.acquisition:
+            data.update(self.acquisition.get_info())
         return data
 
 
 
 class YattorReader(object):
-    def __init__(self, lib, sample_rate):
+    def __init__(self, lib, sample_rate, recorder=None):
         self.closed = False
+        self.recorder = recorder
         self.lib = lib
         self.sample_rate = sample_rate
         FloatArray_t = c_float * (sample_rate*2)
@@ -108,6 +115,8 @@ class YattorReader(object):
             chunk = np.frombuffer(buffer=self.floatBuffer, dtype=np.float32, count=amount)
             #chunk = np.frombuffer(buffer=self.wordBuffer, dtype=np.uint16, count=amount)#.astype(np.float32)
             chunk = chunk * 1000
+            if self.recorder:
+                self.recorder.write(chunk)
             return chunk
         if amount==0:
             if self.lib.yattor_working():
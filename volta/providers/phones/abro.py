@@ -2,13 +2,12 @@ import logging
 import re
 import pkg_resources
 import time
-import threading
 
 from netort.data_processing import Drain, get_nowait_from_queue
 from netort.resource import manager as resource
 
 from volta.common.interfaces import Phone
-from volta.common.util import LogParser, Executioner
+from volta.common.util import LogParser, Executioner, ShellexecMetrics
 
 
 logger = logging.getLogger(__name__)
@@ -46,12 +45,12 @@ class Abro(Phone):
         self.test_performer = None
         self.phone_q = None
         self.ADB_CMD =  config.get_option('phone', 'util', 'adb')
+        self.log_prefilter = config.get_option('phone', 'log_prefilter', [])
+        self.logcat_filterspecs = config.get_option('phone', 'logcat_filterspecs', [])
         self.worker = None
         self.closed = False
         self.shellexec_metrics = config.get_option('phone', 'shellexec_metrics')
-        self.shellexec_executor = threading.Thread(target=self.__shell_executor)
-        self.shellexec_executor.setDaemon(True)
-        self.shellexec_executor.start()
+        self.shellexec_executor = None
         self.my_metrics = {}
         self.__create_my_metrics()
 
@@ -104,16 +103,24 @@ class Abro(Phone):
     def start(self, results):
         self.phone_q = results
         self.__start_async_logcat()
+        self.shellexec_executor = ShellexecMetrics(
+            self.shellexec_metrics, self.my_metrics, self.ADB_CMD+' -s '+self.source+' shell',
+            self.core.data_session.start_time
+        )
+        self.shellexec_executor.start()
 
 
     def __start_async_logcat(self):
         cmd = self.ADB_CMD+' -s '+self.source+' logcat -v time'
+        if self.logcat_filterspecs:
+            cmd = cmd+' '+' '.join(self.logcat_filterspecs)
         self.worker = Executioner(cmd)
         out_q, err_q = self.worker.execute()
 
         self.logcat_pipeline = Drain(
-            LogParser(
-                out_q, self.compiled_regexp, self.config.get_option('phone', 'type')
+            self.create_log_parser(
+                out_q, LogParser, self.compiled_regexp, self.config.get_option('phone', 'type'),
+                prefilter=self.log_prefilter
             ),
             self.my_metrics['events']
         )
@@ -130,10 +137,13 @@ class Abro(Phone):
 
     def end(self):
         self.closed = True
+        if self.shellexec_executor:
+            self.shellexec_executor.close()
         if self.worker:
             self.worker.close()
         if self.test_performer:
             self.test_performer.close()
+        self.close_log_parser()
         if self.logcat_pipeline:
             self.logcat_pipeline.close()
 
@@ -148,41 +158,6 @@ class Abro(Phone):
             data['grabber_queue_size'] = self.phone_q.qsize()
         if self.test_performer:
             data['test_performer_is_finished'] = self.test_performer.is_finished()
+        if self.shellexec_executor:
+            data.update(self.shellexec_executor.get_info())
         return data
-
-
-    def __shell_executor(self):
-        while not self.closed:
-            for key, value in self.shellexec_metrics.items():
-                try:
-                    if not self.shellexec_metrics[key].get('last_ts') \
-                            or self.shellexec_metrics[key]['last_ts'] < int(time.time()) * 10**6:
-                        metric_value = self.__execute_shellexec_metric(value.get('cmd'))
-                        ts = int(time.time()) * 10 ** 6
-                        if not value.get('start_time'):
-                            self.shellexec_metrics[key]['start_time'] = ts
-                            ts = 0
-                        else:
-                            ts = ts - self.shellexec_metrics[key]['start_time']
-                            self.shellexec_metrics[key]['last_ts'] = ts
-                        self.my_metrics[key].put(
-                            pd.DataFrame(
-                                data={
-                                    ts:
-                                        {'ts': ts, 'value': metric_value}
-                                },
-                            ).T
-                        )
-                    else:
-                        continue
-                except Exception:
-                    logger.warning('Failed to collect shellexec metric: %s', key)
-                    logger.debug('Failed to collect shellexec metric: %s', key, exc_info=True)
-            time.sleep(0.1)
-
-
-    @staticmethod
-    def __execute_shellexec_metric(cmd):
-        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-        (stdout, stderr) = proc.communicate()
-        return stdout.strip('\n')
@@ -5,15 +5,15 @@ import logging
 import re
 import pkg_resources
 import time
-import threading
 import subprocess
-import pandas as pd
+import hashlib
+from multiprocessing.pool import ThreadPool
 
 from netort.data_processing import Drain, get_nowait_from_queue
 from netort.resource import manager as resource
 
 from volta.common.interfaces import Phone
-from volta.common.util import LogParser, Executioner
+from volta.common.util import LogParser, EpochLogParser, Executioner, ShellexecMetrics
 
 
 logger = logging.getLogger(__name__)
@@ -49,6 +49,10 @@ class AndroidPhone(Phone):
         test_class (string, optional): app class to be started during test execution
         test_package (string, optional): app package to be started during test execution
         test_runner (string, optional): app runner to be started during test execution
+        logcat_format (string, optional): `threadtime` (default) or `epoch` - read `adb logcat -v epoch`
+            w/ regexp-free EpochLogParser, `event_regexp` is not used then
+        log_prefilter (list, optional): parse only log lines w/ any of these substrings, e.g. ['[volta]']
+        logcat_filterspecs (list, optional): `adb logcat` filter specs, e.g. ['MyTestApp:V', '*:S']
 
     """
 
@@ -79,6 +83,9 @@ class AndroidPhone(Phone):
         self.test_package = config.get_option('phone', 'test_package')
         self.test_runner = config.get_option('phone', 'test_runner')
         self.cleanup_apps = config.get_option('phone', 'cleanup_apps')
+        self.logcat_format = config.get_option('phone', 'logcat_format', 'threadtime')
+        self.log_prefilter = config.get_option('phone', 'log_prefilter', [])
+        self.logcat_filterspecs = config.get_option('phone', 'logcat_filterspecs', [])
         try:
             self.compiled_regexp = re.compile(
                 config.get_option('phone', 'event_regexp', event_regexp), re.VERBOSE | re.IGNORECASE
@@ -99,10 +106,7 @@ class AndroidPhone(Phone):
         self.closed = False
 
         self.shellexec_metrics = config.get_option('phone', 'shellexec_metrics')
-        self.shellexec_executor = threading.Thread(target=self.__shell_executor)
-        self.shellexec_executor.setDaemon(True)
-        self.shellexec_executor.start()
-
+        self.shellexec_executor = None
         self.my_metrics = {}
         self.__create_my_metrics()
 
@@ -157,53 +161,140 @@ class AndroidPhone(Phone):
         logger.info('Command \'%s\' executed on device %s. Retcode: %s', cmd, self.source, worker.is_finished())
 
     def adb_execution(self, cmd):
-        def read_process_queues_and_report(outs_q, errs_q):
-            outputs = get_nowait_from_queue(outs_q)
-            for chunk in outputs:
-                logger.debug('Command \'%s\' output: %s', cmd, chunk.strip('\n'))
-            errors = get_nowait_from_queue(errs_q)
-            for err_chunk in errors:
-                logger.warning('Errors in command \'%s\' output: %s', cmd, err_chunk.strip('\n'))
+        """ Run adb command and wait for it
+
+        Returns:
+            list: command output lines
+
+        Raises:
+            RuntimeError: command failed
+        """
         worker = Executioner(cmd)
         outs_q, errs_q = worker.execute()
-        while worker.is_finished() is None:
-            read_process_queues_and_report(outs_q, errs_q)
-            time.sleep(1)
-        read_process_queues_and_report(outs_q, errs_q)
-        while not outs_q.qsize() != 0 and errs_q.qsize() != 0:
-            time.sleep(0.5)
+        retcode = worker.wait()
+        outputs = []
+        for chunk in get_nowait_from_queue(outs_q):
+            if isinstance(chunk, bytes):
+                chunk = chunk.decode('utf-8', 'replace')
+            outputs.append(chunk.rstrip('\r\n'))
+            logger.debug('Command \'%s\' output: %s', cmd, outputs[-1])
+        for err_chunk in get_nowait_from_queue(errs_q):
+            if isinstance(err_chunk, bytes):
+                err_chunk = err_chunk.decode('utf-8', 'replace')
+            logger.warning('Errors in command \'%s\' output: %s', cmd, err_chunk.strip('\n'))
         worker.close()
-        logger.info('Command \'%s\' executed on device %s. Retcode: %s', cmd, self.source, worker.is_finished())
-        if worker.is_finished() != 0:
+        logger.info('Command \'%s\' executed on device %s. Retcode: %s', cmd, self.source, retcode)
+        if retcode != 0:
             raise RuntimeError('Failed to execute adb command \'%s\'' % cmd)
+        return outputs
+
+    @staticmethod
+    def resolve_apk(path):
+        """ Local file name and md5 of apk, downloads it if `path` is url
+
+        Returns:
+            tuple: file name, md5 hexdigest
+        """
+        fname = resource.get_opener(path).get_filename
+        md5 = hashlib.md5()
+        with open(fname, 'rb') as apk:
+            for block in iter(lambda: apk.read(1024 * 1024), b''):
+                md5.update(block)
+        return fname, md5.hexdigest()
+
+    def installed_apks(self):
+        """ Third-party packages on device and md5 of their installed apks, one adb round-trip
+
+        Installed base apk is a copy of apk file it was installed from, so same md5 means same apk
+
+        Returns:
+            dict: package -> md5, None if device can't tell
+        """
+        cmd = "adb -s {device_id} shell " \
+              "'pm list packages -f -3 | while read line; do " \
+              "apk=${{line#package:}}; echo \"$(md5sum ${{apk%=*}}) ${{apk##*=}}\"; done'".format(device_id=self.source)
+        try:
+            outputs = self.adb_execution(cmd)
+        except RuntimeError:
+            logger.warning('Failed to get installed packages from device, all apks will be installed')
+            logger.debug('Failed to get installed packages from device', exc_info=True)
+            return
+        installed = {}
+        for line in outputs:
+            fields = line.split()
+            # md5, apk path, package
+            if len(fields) == 3 and len(fields[0]) == 32:
+                installed[fields[2]] = fields[0]
+        return installed
 
     def prepare(self):
         """ Phone preparation: install apps etc
 
         pipeline:
-            install lightning
-            install apks
+            resolve lightning and test apks concurrently, query installed packages
+            cleanup apps
+            install lightning and test apks, skip ones already installed
             clean log
         """
-        # apps cleanup
-        for apk in self.cleanup_apps:
-            self.adb_execution("adb -s {device_id} uninstall {app}".format(device_id=self.source, app=apk))
-
-        # install lightning
-        self.lightning_apk_fname = resource.get_opener(self.lightning_apk_path).get_filename
-        logger.info('Installing lightning apk...')
-        self.adb_execution(
-            "adb -s {device_id} install -r -d -t {apk}".format(device_id=self.source, apk=self.lightning_apk_fname)
+        # resolve apks while device is queried
+        step_start = time.time()
+        apk_paths = [self.lightning_apk_path] + list(self.test_apps)
+        pool = ThreadPool(len(apk_paths))
+        try:
+            resolved = pool.map_async(self.resolve_apk, apk_paths)
+            installed = self.installed_apks()
+            apks = resolved.get()
+        finally:
+            pool.close()
+        self.lightning_apk_fname = apks[0][0]
+        logger.info(
+            'Resolved %s apks, %s packages installed on device, took %.1f s',
+            len(apks), len(installed) if installed is not None else 'unknown amount of', time.time() - step_start
         )
 
-        # install apks
-        for apk in self.test_apps:
-            apk_fname = resource.get_opener(apk).get_filename
-            self.adb_execution("adb -s {device_id} install -r -d -t {apk}".format(device_id=self.source, apk=apk_fname))
+        # apps cleanup
+        step_start = time.time()
+        for app in self.cleanup_apps:
+            if installed is not None and app not in installed:
+                logger.info('App %s is not installed, cleanup skipped', app)
+                continue
+            self.adb_execution("adb -s {device_id} uninstall {app}".format(device_id=self.source, app=app))
+            if installed is not None:
+                installed.pop(app)
+        logger.info('Apps cleanup took %.1f s', time.time() - step_start)
+
+        # install lightning and apks
+        step_start = time.time()
+        installed_md5 = set(installed.values()) if installed is not None else set()
+        to_install = []
+        for apk_fname, md5 in apks:
+            if md5 in installed_md5:
+                logger.info('Apk %s is already installed, skipped', apk_fname)
+            elif apk_fname not in to_install:
+                to_install.append(apk_fname)
+        self.install_apks(to_install)
+        logger.info('%s apks installed, took %.1f s', len(to_install), time.time() - step_start)
 
         # clean logcat
         self.adb_execution("adb -s {device_id} logcat -c".format(device_id=self.source))
 
+    def install_apks(self, apk_fnames):
+        """ Install apks in one `adb install-multi-package` if supported, one by one otherwise """
+        if len(apk_fnames) > 1:
+            try:
+                self.adb_execution(
+                    "adb -s {device_id} install-multi-package -r -d -t {apks}".format(
+                        device_id=self.source, apks=' '.join(apk_fnames)
+                    )
+                )
+                return
+            except RuntimeError:
+                logger.info('Failed to install apks in one batch, installing them one by one...')
+        for apk_fname in apk_fnames:
+            self.adb_execution(
+                "adb -s {device_id} install -r -d -t {apk}".format(device_id=self.source, apk=apk_fname)
+            )
+
     def start(self, results):
         """ Grab stage: starts log reader, make sync w/ flashlight
         Args:
@@ -211,7 +302,15 @@ class AndroidPhone(Phone):
         """
         self.phone_q = results
         self.__start_async_logcat()
-        # start flashes app
+        self.shellexec_executor = ShellexecMetrics(
+            self.shellexec_metrics, self.my_metrics, "adb -s {device_id} shell".format(device_id=self.source),
+            self.core.data_session.start_time
+        )
+        self.shellexec_executor.start()
+        self.run_lightning()
+
+    def run_lightning(self):
+        """ Sync stage: start flashes app and wait for it """
         self.adb_execution(
             "adb -s {device_id} shell am start -n {package}/{runner}.MainActivity".format(
                 device_id=self.source,
@@ -224,14 +323,26 @@ class AndroidPhone(Phone):
 
     def __start_async_logcat(self):
         """ Start logcat read in subprocess and make threads to read its stdout/stderr to queues """
-        cmd = "adb -s {device_id} logcat".format(device_id=self.source)
+        if self.logcat_format == 'epoch':
+            cmd = "adb -s {device_id} logcat -v epoch".format(device_id=self.source)
+        else:
+            cmd = "adb -s {device_id} logcat".format(device_id=self.source)
+        if self.logcat_filterspecs:
+            cmd = '{cmd} {specs}'.format(cmd=cmd, specs=' '.join(self.logcat_filterspecs))
         self.worker = Executioner(cmd)
         out_q, err_q = self.worker.execute()
 
+        if self.logcat_format == 'epoch':
+            parser = self.create_log_parser(
+                out_q, EpochLogParser, self.config.get_option('phone', 'type'), prefilter=self.log_prefilter
+            )
+        else:
+            parser = self.create_log_parser(
+                out_q, LogParser, self.compiled_regexp, self.config.get_option('phone', 'type'),
+                prefilter=self.log_prefilter
+            )
         self.logcat_pipeline = Drain(
-            LogParser(
-                out_q, self.compiled_regexp, self.config.get_option('phone', 'type')
-            ),
+            parser,
             self.my_metrics['events']
         )
         self.logcat_pipeline.start()
@@ -255,10 +366,13 @@ class AndroidPhone(Phone):
     def end(self):
         """ Stop test and grabbers """
         self.closed = True
+        if self.shellexec_executor:
+            self.shellexec_executor.close()
         if self.worker:
             self.worker.close()
         if self.test_performer:
             self.test_performer.close()
+        self.close_log_parser()
         if self.logcat_pipeline:
             self.logcat_pipeline.close()
 
@@ -275,40 +389,6 @@ class AndroidPhone(Phone):
             data['grabber_queue_size'] = self.phone_q.qsize()
         if self.test_performer:
             data['test_performer_is_finished'] = self.test_performer.is_finished()
+        if self.shellexec_executor:
+            data.update(self.shellexec_executor.get_info())
         return data
-
-    def __shell_executor(self):
-        while not self.closed:
-            for key, value in self.shellexec_metrics.items():
-                try:
-                    if not self.shellexec_metrics[key].get('last_ts') \
-                            or self.shellexec_metrics[key]['last_ts'] < int(time.time()) * 10**6:
-                        metric_value = self.__execute_shellexec_metric(value.get('cmd'))
-                        ts = int(time.time()) * 10 ** 6
-                        if not value.get('start_time'):
-                            self.shellexec_metrics[key]['start_time'] = ts
-                            ts = 0
-                        else:
-                            ts = ts - self.shellexec_metrics[key]['start_time']
-                            self.shellexec_metrics[key]['last_ts'] = ts
-                        self.my_metrics[key].put(
-                            pd.DataFrame(
-                                data={
-                                    ts:
-                                        {'ts': ts, 'value': metric_value}
-                                },
-                            ).T
-                        )
-                    else:
-                        continue
-                except Exception:
-                    logger.warning('Failed to collect shellexec metric: %s', key)
-                    logger.debug('Failed to collect shellexec metric: %s', key, exc_info=True)
-
-            time.sleep(0.1)
-
-    @staticmethod
-    def __execute_shellexec_metric(cmd):
-        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-        (stdout, stderr) = proc.communicate()
-        return stdout.strip('\n')
@@ -140,6 +140,7 @@ class iPhone(Phone):
     def end(self):
         """ pipeline: stop async log process, readers and queues """
         self.worker.close()
+        self.close_log_parser()
         if self.logcat_pipeline:
             self.logcat_pipeline.close()
 
@@ -153,8 +154,8 @@ class iPhone(Phone):
         out_q, err_q = self.worker.execute()
 
         self.logcat_pipeline = Drain(
-            LogParser(
-                out_q, self.compiled_regexp, self.config.get_option('phone', 'type')
+            self.create_log_parser(
+                out_q, LogParser, self.compiled_regexp, self.config.get_option('phone', 'type')
             ),
             self.my_metrics['events']
         )